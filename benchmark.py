@@ -0,0 +1,313 @@
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# Benchmarks for the coloring and scheduling path.
+#   python benchmark.py import-time    -> import time of the headless modules (fails if over budget
+#                                         or if they pull in the plotting stack)
+#   python benchmark.py run            -> graph build, coloring, single-classroom scheduling
+#                                         (schedule_courses) and campus scheduling (rooms scaled to the
+#                                         catalog) on seeded synthetic catalogs; with --baseline
+#                                         (e.g. benchmark_baseline.json), fails on regressions
+# benchmark_baseline.json holds the default run on the reference machine; times and memory depend on
+# the hardware, so regenerate it with --output when that changes.
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must only be loaded when a plot is requested
+PLOTTING_MODULES = ('matplotlib', 'networkx')
+
+
+def measure_import_time(module, repeat=5):
+    # Import the module in fresh interpreters and keep the best time
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(sys.modules))\n"
+    )
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, capture_output=True, text=True,
+                                check=True).stdout.splitlines()
+        seconds, loaded = float(output[0]), output[1].split()
+        best = seconds if best is None else min(best, seconds)
+
+    plotting = sorted({name.split('.')[0] for name in loaded if name.split('.')[0] in PLOTTING_MODULES})
+    return {'module': module, 'seconds': round(best, 4), 'plotting_modules': plotting}
+
+
+def run_import_time(args):
+    failures = []
+    results = []
+    for module in args.modules:
+        result = measure_import_time(module, args.repeat)
+        results.append(result)
+        if result['plotting_modules']:
+            failures.append(f"{module} imports {', '.join(result['plotting_modules'])}")
+        if result['seconds'] > args.max_seconds:
+            failures.append(f"{module} takes {result['seconds']}s to import (budget {args.max_seconds}s)")
+
+    print(json.dumps(results, indent=2))
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+# ---------------------------- SYNTHETIC CATALOGS ----------------------------
+# Every generator returns (courses, src, dst): course names and the conflicts as arrays of
+# course indexes. The same seed always gives the same catalog.
+
+def random_catalog(n_courses, avg_degree=8, seed=0):
+    # Uniform random conflicts (Erdos-Renyi)
+    rng = np.random.default_rng(seed)
+    n_conflicts = n_courses * avg_degree // 2
+    return _course_names(n_courses), rng.integers(0, n_courses, n_conflicts), rng.integers(0, n_courses, n_conflicts)
+
+
+def power_law_catalog(n_courses, avg_degree=8, seed=0, exponent=2.5):
+    # A few very popular courses conflict with many others (Chung-Lu with Pareto weights)
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(exponent - 1, n_courses) + 1
+    weights /= weights.sum()
+    n_conflicts = n_courses * avg_degree // 2
+    return _course_names(n_courses), rng.choice(n_courses, n_conflicts, p=weights), rng.choice(n_courses, n_conflicts, p=weights)
+
+
+def clustered_catalog(n_courses, avg_degree=8, seed=0, departments=20, cross_fraction=0.05):
+    # Courses conflict mostly inside their own department
+    rng = np.random.default_rng(seed)
+    n_conflicts = n_courses * avg_degree // 2
+    department = rng.integers(0, departments, n_courses)
+    members = [np.flatnonzero(department == d) for d in range(departments)]
+    members = [courses for courses in members if len(courses)]
+
+    # Pick a department per conflict, then two of its courses
+    chosen = rng.integers(0, len(members), n_conflicts)
+    sizes = np.array([len(courses) for courses in members])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    flat = np.concatenate(members)
+    src = flat[offsets[chosen] + rng.integers(0, sizes[chosen])]
+    dst = flat[offsets[chosen] + (rng.random(n_conflicts) * sizes[chosen]).astype(np.int64)]
+
+    # A few conflicts cross departments
+    cross = rng.random(n_conflicts) < cross_fraction
+    dst[cross] = rng.integers(0, n_courses, cross.sum())
+    return _course_names(n_courses), src, dst
+
+
+CATALOGS = {
+    'random': random_catalog,
+    'power_law': power_law_catalog,
+    'clustered': clustered_catalog,
+}
+
+
+def _course_names(n_courses):
+    return [f"Course {i:06d}" for i in range(n_courses)]
+
+
+def catalog_constraints(courses, seed=0):
+    # Matching course_sessions and allowed_time_slots for a synthetic catalog
+    from trimesterSchedule import afternoon_slots, morning_slots
+
+    rng = np.random.default_rng(seed)
+    all_day = set(morning_slots) | set(afternoon_slots)
+    choices = [all_day, set(morning_slots), set(afternoon_slots)]
+    sessions = rng.integers(4, 21, len(courses)).tolist()
+    allowed = rng.choice(len(choices), len(courses), p=[0.6, 0.2, 0.2]).tolist()
+    return dict(zip(courses, sessions)), {course: choices[i] for course, i in zip(courses, allowed)}
+
+
+def catalog_campus(courses, course_sessions, n_dates, seed=0, occupancy=0.8, courses_per_professor=3):
+    # Rooms, professors and sizes to schedule a synthetic catalog with CampusSchedule. Every
+    # professor teaches about courses_per_professor courses, and rooms are added until the sessions
+    # fill about occupancy of the room slots. The conflicts come from the course graph
+    from trimesterSchedule import time_slots
+
+    rng = np.random.default_rng(seed)
+    professors = rng.integers(0, max(len(courses) // courses_per_professor, 1), len(courses)).tolist()
+    course_resources = {course: [f"Professor {professor:06d}"] for course, professor in zip(courses, professors)}
+
+    n_rooms = -(-sum(course_sessions.values()) // int(n_dates * len(time_slots) * occupancy))
+    rooms = {f"Room {i:04d}": int(capacity) for i, capacity in enumerate(rng.integers(30, 251, n_rooms))}
+    rooms[f"Room {n_rooms:04d}"] = 250  # At least one room holds the largest course
+    course_sizes = dict(zip(courses, rng.integers(10, 201, len(courses)).tolist()))
+    return rooms, course_resources, course_sizes
+
+
+# ---------------------------- BENCHMARK RUN ----------------------------
+@contextlib.contextmanager
+def _quiet_logger(name):
+    # Silence the per-course warnings of a logger (e.g. unplaced sessions) while timing
+    logger = logging.getLogger(name)
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def _timed(function, repeat=1):
+    # Result of the function and its best time over repeat runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def benchmark_case(kind, n_courses, seed=0, engines=('welsh_powell', 'dsatur', 'smallest_last'), memory=True,
+                   repeat=1):
+    # Time graph build, coloring and scheduling separately for one synthetic catalog
+    from campusSchedule import CampusSchedule
+    from courseGraph import CourseGraph
+    from trimesterSchedule import TrimesterSchedule
+
+    courses, src, dst = CATALOGS[kind](n_courses, seed=seed)
+    course_sessions, allowed_time_slots = catalog_constraints(courses, seed)
+
+    # A single-classroom trimester only has room for about a hundred sessions, so most of a large
+    # catalog is left unplaced by schedule_courses; the campus run has rooms scaled to its size
+    start_date, end_date = datetime.date(2023, 9, 18), datetime.date(2023, 12, 19)
+    n_dates = len(TrimesterSchedule(start_date, end_date).dates)
+    rooms, course_resources, course_sizes = catalog_campus(courses, course_sessions, n_dates, seed)
+
+    def build():
+        course_graph = CourseGraph()
+        for course in courses:
+            course_graph.add_course(course)
+        course_graph.add_conflicts((courses[i], courses[j]) for i, j in zip(src.tolist(), dst.tolist()))
+        return course_graph.freeze()
+
+    def schedule(course_colors):
+        trimester = TrimesterSchedule(start_date, end_date)
+        trimester.schedule_courses(course_colors, course_sessions, allowed_time_slots, seed=seed)
+        return trimester
+
+    def schedule_campus(course_colors):
+        campus = CampusSchedule(start_date, end_date, rooms)
+        campus.schedule_campus(course_colors, course_sessions, allowed_time_slots, course_resources, course_sizes,
+                               course_graph, seed=seed)
+        return campus
+
+    metrics = {}
+    with _quiet_logger('trimesterSchedule'), _quiet_logger('campusSchedule'):
+        course_graph, metrics['build_seconds'] = _timed(build, repeat)
+        metrics['conflicts'] = int(len(course_graph.indices) // 2)
+        for engine in engines:
+            course_colors, metrics[f'color_{engine}_seconds'] = _timed(lambda: course_graph.welsh_powell_algorithm(engine), repeat)
+            metrics[f'color_{engine}_colors'] = max(course_colors.values()) + 1
+        course_colors = course_graph.welsh_powell_algorithm()
+        trimester, metrics['schedule_seconds'] = _timed(lambda: schedule(course_colors), repeat)
+        metrics['schedule_unplaced'] = sum(trimester.unplaced.values())
+        campus, metrics['campus_seconds'] = _timed(lambda: schedule_campus(course_colors), repeat)
+        metrics['campus_rooms'] = len(rooms)
+        metrics['campus_unplaced'] = sum(campus.unplaced.values())
+
+        # Peak memory is measured in a second pass, as tracemalloc slows everything down
+        if memory:
+            tracemalloc.start()
+            course_graph = build()
+            metrics['build_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            course_colors = course_graph.welsh_powell_algorithm()
+            metrics['color_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            schedule(course_colors)
+            metrics['schedule_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            schedule_campus(course_colors)
+            metrics['campus_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {metric: round(value, 6) if isinstance(value, float) else value for metric, value in metrics.items()}
+
+
+def compare_to_baseline(results, baseline, tolerance, noise_seconds=0.005):
+    # Times and memory may grow by tolerance (a fraction, plus noise_seconds for very short timings);
+    # colors and unplaced sessions may not grow
+    regressions = []
+    for case, metrics in results['cases'].items():
+        for metric, value in metrics.items():
+            previous = baseline.get('cases', {}).get(case, {}).get(metric)
+            if previous is None:
+                continue
+            if metric.endswith('_seconds'):
+                limit = previous * (1 + tolerance) + noise_seconds
+            elif metric.endswith('_bytes'):
+                limit = previous * (1 + tolerance)
+            elif metric.endswith(('_colors', '_unplaced')):
+                limit = previous
+            else:
+                continue
+            if value > limit:
+                regressions.append(f"{case} {metric}: {value} (baseline {previous})")
+    return regressions
+
+
+def run_benchmarks(args):
+    results = {'python': sys.version.split()[0], 'seed': args.seed, 'cases': {}}
+    for kind in args.kinds:
+        for n_courses in args.sizes:
+            case = f"{kind}-{n_courses}"
+            results['cases'][case] = benchmark_case(kind, n_courses, args.seed, args.engines, not args.no_memory,
+                                                   args.repeat)
+            print(case, json.dumps(results['cases'][case]), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for course coloring and scheduling")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_time = commands.add_parser('import-time', help="Import time of the headless modules")
+    import_time.add_argument('--modules', nargs='+', default=['courseGraph', 'trimesterSchedule'])
+    import_time.add_argument('--max-seconds', type=float, default=0.5)
+    import_time.add_argument('--repeat', type=int, default=5)
+    import_time.set_defaults(run=run_import_time)
+
+    run = commands.add_parser('run', help="Build, coloring and scheduling on synthetic catalogs")
+    run.add_argument('--kinds', nargs='+', default=list(CATALOGS), choices=list(CATALOGS))
+    run.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    run.add_argument('--engines', nargs='+', default=['welsh_powell', 'dsatur', 'smallest_last'])
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--repeat', type=int, default=3, help="Keep the best time of this many runs")
+    run.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    run.add_argument('--output', help="Write the results as JSON to this file instead of stdout")
+    run.add_argument('--baseline', help="Results JSON to compare against (e.g. benchmark_baseline.json); exits 1 on "
+                                        "regressions")
+    run.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown/memory growth (fraction)")
+    run.set_defaults(run=run_benchmarks)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
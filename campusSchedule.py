@@ -0,0 +1,210 @@
+import bisect
+import collections
+import logging
+import random
+import numpy as np
+from instrumentation import NULL_STATS
+from scheduleSolver import UnsatisfiableScheduleError
+from trimesterSchedule import TrimesterSchedule, slot_order, slot_rank, time_slots
+
+logger = logging.getLogger(__name__)
+
+# Whole-campus scheduling: many rooms, cohorts and professors at once.
+# Occupancy is held in NumPy boolean tensors of shape (day, slot, room) and (day, slot, resource),
+# where a resource is a cohort or a professor. A session fits a (day, slot) when the slot is allowed
+# for the course, none of its resources is busy, none of them has reached max_courses_per_day that
+# day, the course has no other session that day, no course it conflicts with in the course graph
+# is already there, and some free room is large enough. All of this is computed for every
+# (day, slot) of a course at once with mask operations.
+# Courses sharing a cohort or a professor never share a slot, and neither do courses with a
+# conflict in the graph (e.g. shared students from CourseGraph.from_enrollments): the (day, slot)
+# cells of every placed course are kept, so those of its neighbors are masked out in one gather.
+# Free rooms are counted per (day, slot) and capacity level, with the largest level that still has
+# a free room, so checking for a room that fits doesn't depend on the number of rooms. Placing a
+# session only changes its own day, so the days of a course are all chosen from one feasibility
+# mask and its sessions occupied in one vectorized update. The coloring is only used to place the
+# largest color classes first.
+
+
+class CampusSchedule(TrimesterSchedule):
+    def __init__(self, start_date, end_date, rooms, max_courses_per_day=2, holidays=None,
+                 weekmask='Mon Tue Wed Thu Fri'):
+        super().__init__(start_date, end_date, max_courses_per_day, holidays, weekmask)
+        if not rooms:
+            raise ValueError("A campus needs at least one room.")
+
+        # Rooms sorted by capacity, so the first free room that fits is also the smallest one
+        self.rooms = sorted(rooms, key=lambda room: (rooms[room], room))
+        self.room_capacities = np.array([rooms[room] for room in self.rooms], dtype=np.int64)
+        # Distinct capacities; the rooms of a level are consecutive in self.rooms
+        self.capacity_levels, self.level_starts, self.level_sizes = np.unique(
+            self.room_capacities, return_index=True, return_counts=True)
+        self.slot_ids = list(slot_order)  # Slot axis of the tensors, in chronological order
+
+    def fingerprint(self, *parts):
+        return super().fingerprint('campus', dict(zip(self.rooms, self.room_capacities.tolist())), *parts)
+
+    def _reset_occupancy(self, resources, course_graph, max_sessions):
+        shape = (len(self.dates), len(self.slot_ids))
+        self.resources = resources
+        self.resource_positions = {resource: i for i, resource in enumerate(resources)}
+        self.room_occupancy = np.zeros(shape + (len(self.rooms),), dtype=bool)
+        self.free_rooms = np.tile(self.level_sizes, shape + (1,))  # (day, slot, capacity level)
+        self.top_level = np.full(shape, len(self.level_sizes) - 1, dtype=np.int64)  # Largest level with a free room
+        self.resource_occupancy = np.zeros(shape + (len(resources),), dtype=bool)
+        self.resource_day_load = np.zeros((len(self.dates), len(resources)), dtype=np.int64)
+
+        # Flat (day, slot) cells of the sessions of every course, by course graph id (-1 is empty)
+        self.course_graph = course_graph.freeze()
+        self.course_cells = np.full((len(course_graph.course_names), max_sessions), -1, dtype=np.int64)
+        self.course_cell_counts = np.zeros(len(course_graph.course_names), dtype=np.int64)
+
+    def schedule_campus(self, course_colors, course_sessions, allowed_time_slots, course_resources, course_sizes,
+                        course_graph, seed=None, cache=None, stats=None):
+        # Place every session of every course in a (date, slot, room).
+        # course_resources maps each course to the cohorts and professors that attend it,
+        # course_sizes to its number of students, and courses with a conflict in course_graph are
+        # never in the same slot. Returns {date: [(course, time_slot, room)]}; sessions that don't
+        # fit are left in self.unplaced ({course: missing sessions}).
+        # Courses whose size no room can hold raise UnsatisfiableScheduleError
+        stats = NULL_STATS if stats is None else stats
+        missing = [course for course in course_colors if course not in course_graph.course_ids]
+        if missing:
+            raise ValueError(f"Courses missing from the course graph: {', '.join(sorted(missing))}")
+
+        with stats.run('campus_scheduling'):
+            key = None
+            if cache is not None and seed is not None:
+                key = self.fingerprint(seed, course_colors, course_sessions, allowed_time_slots, course_resources,
+                                       course_sizes, course_graph.fingerprint())
+                cached = cache.get(key)
+                if cached is not None:
+                    stats.count('cache_hits')
+                    schedule, self.unplaced = cached
+                    schedule = {date: list(day_schedule) for date, day_schedule in schedule.items()}
+                    self._rebuild_occupancy(schedule, course_resources, course_graph)
+                    self.schedule = schedule
+                    return schedule
+                stats.count('cache_misses')
+
+            too_large = [course for course in course_colors if course_sizes[course] > self.room_capacities[-1]]
+            if too_large:
+                raise UnsatisfiableScheduleError(
+                    f"no room can hold {', '.join(sorted(too_large))} (largest room seats {self.room_capacities[-1]})")
+
+            resources = sorted({resource for course in course_colors for resource in course_resources[course]})
+            self._reset_occupancy(resources, course_graph, max((course_sessions[course] for course in course_colors),
+                                                               default=0))
+            schedule = {date: [] for date in self.dates}
+            self.unplaced = {}
+
+            with stats.timer('placement'):
+                for course in self._placement_order(course_colors, course_sessions, course_sizes, seed):
+                    placed = self._place_course(course, course_sessions[course], allowed_time_slots[course],
+                                                course_resources[course], course_sizes[course], schedule)
+                    if placed < course_sessions[course]:
+                        self.unplaced[course] = course_sessions[course] - placed
+
+            for date in schedule:
+                schedule[date].sort(key=lambda x: (slot_rank[x[1]], x[2]))
+
+            for course, missing in self.unplaced.items():
+                logger.warning("%s has only been scheduled %d times, but needs %d sessions.",
+                               course, course_sessions[course] - missing, course_sessions[course])
+            stats.count('courses', len(course_colors))
+            stats.count('unplaced_sessions', sum(self.unplaced.values()))
+
+            if key is not None:
+                cache.put(key, ({date: list(day_schedule) for date, day_schedule in schedule.items()}, self.unplaced))
+            self.schedule = schedule
+            return schedule
+
+    def _placement_order(self, course_colors, course_sessions, course_sizes, seed):
+        # Largest color classes first; inside a class, the courses needing the biggest rooms and the
+        # most sessions go first. The seed only breaks ties
+        rng = random.Random(seed)
+        courses = [course for course in course_colors if course_sessions[course] > 0]
+        rng.shuffle(courses)
+        class_sizes = collections.Counter(course_colors.values())
+        return sorted(courses, key=lambda course: (-class_sizes[course_colors[course]], course_colors[course],
+                                                   -course_sizes[course], -course_sessions[course]))
+
+    def _place_course(self, course, sessions, allowed_slots, resources, size, schedule):
+        # Place the sessions of one course, spread evenly over the trimester. Returns how many fit
+        n_days, n_slots = len(self.dates), len(self.slot_ids)
+        resource_ids = np.array([self.resource_positions[resource] for resource in resources], dtype=np.int64)
+        level = np.searchsorted(self.capacity_levels, size)  # Smallest capacity level that fits
+        course_id = self.course_graph.course_ids[course]
+        neighbors = self.course_graph.indices[self.course_graph.indptr[course_id]:self.course_graph.indptr[course_id + 1]]
+
+        # Feasible (day, slot) pairs, computed for the whole trimester at once
+        slot_allowed = np.array([slot in allowed_slots for slot in self.slot_ids])
+        resources_free = ~self.resource_occupancy[:, :, resource_ids].any(axis=2)
+        resources_fresh = (self.resource_day_load[:, resource_ids] < self.max_courses_per_day).all(axis=1)
+        rooms_free = self.top_level >= level
+        conflicts_free = np.ones(n_days * n_slots, dtype=bool)
+        cells = self.course_cells[neighbors].ravel()
+        conflicts_free[cells[cells >= 0]] = False
+        feasible = (slot_allowed & resources_free & rooms_free & conflicts_free.reshape(n_days, n_slots)
+                    & resources_fresh[:, None])
+
+        # The feasible day nearest to each target; subjects are not repeated on the same day
+        free_days = np.flatnonzero(feasible.any(axis=1)).tolist()
+        days = []
+        for target in ((n_days - 1) * i / max(sessions - 1, 1) for i in range(sessions)):
+            if not free_days:
+                break
+            i = bisect.bisect_left(free_days, target)
+            if i == len(free_days) or (i and target - free_days[i - 1] <= free_days[i] - target):
+                i -= 1
+            days.append(free_days.pop(i))
+        if not days:
+            return 0
+
+        days = np.array(days, dtype=np.int64)
+        slots = feasible[days].argmax(axis=1)  # Earliest feasible slot
+        # Smallest free room that fits: the rooms of a level are taken in order, so the next free one
+        # follows from the count of free rooms
+        levels = level + (self.free_rooms[days, slots, level:] > 0).argmax(axis=1)
+        rooms = self.level_starts[levels] + self.level_sizes[levels] - self.free_rooms[days, slots, levels]
+        self._occupy(course_id, days, slots, levels, rooms, resource_ids)
+
+        for day, slot, room in zip(days.tolist(), slots.tolist(), rooms.tolist()):
+            schedule[self.dates[day]].append((course, time_slots[self.slot_ids[slot]], self.rooms[room]))
+        return len(days)
+
+    def _occupy(self, course_id, days, slots, levels, rooms, resource_ids):
+        # Occupy the sessions of one course, on different days
+        self.room_occupancy[days, slots, rooms] = True
+        free = self.free_rooms[days, slots, levels] - 1
+        self.free_rooms[days, slots, levels] = free
+        self.resource_occupancy[days[:, None], slots[:, None], resource_ids] = True
+        self.resource_day_load[days[:, None], resource_ids] += 1
+        count = self.course_cell_counts[course_id]
+        self.course_cells[course_id, count:count + len(days)] = days * len(self.slot_ids) + slots
+        self.course_cell_counts[course_id] += len(days)
+
+        # Lower the largest free level of the (day, slot) pairs that just used its last room
+        exhausted = (free == 0) & (levels == self.top_level[days, slots])
+        for day, slot in zip(days[exhausted].tolist(), slots[exhausted].tolist()):
+            free_levels = np.flatnonzero(self.free_rooms[day, slot])
+            self.top_level[day, slot] = free_levels[-1] if len(free_levels) else -1
+
+    def _rebuild_occupancy(self, schedule, course_resources, course_graph):
+        # Occupancy tensors of a schedule loaded from the cache
+        room_positions = {room: i for i, room in enumerate(self.rooms)}
+        slot_positions = {time_slots[slot]: i for i, slot in enumerate(self.slot_ids)}
+        course_sessions = collections.defaultdict(list)  # Course -> [(day, slot, room)]
+        for date, day_schedule in schedule.items():
+            day = self.date_positions[date]
+            for course, time_slot, room in day_schedule:
+                course_sessions[course].append((day, slot_positions[time_slot], room_positions[room]))
+
+        self._reset_occupancy(sorted({resource for course in course_sessions for resource in course_resources[course]}),
+                              course_graph, max(map(len, course_sessions.values()), default=0))
+        room_levels = np.searchsorted(self.capacity_levels, self.room_capacities)
+        for course, sessions in course_sessions.items():
+            days, slots, rooms = np.array(sessions, dtype=np.int64).T
+            resource_ids = np.array([self.resource_positions[resource] for resource in course_resources[course]],
+                                    dtype=np.int64)
+            self._occupy(course_graph.course_ids[course], days, slots, room_levels[rooms], rooms, resource_ids)
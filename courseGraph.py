@@ -1,210 +1,433 @@
-import time
-import networkx as nx
-import matplotlib.pyplot as plt
+import csv
+import hashlib
+import itertools
+import logging
+import os
+from array import array
 import numpy as np
-import matplotlib.colors as mcolors
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Button
+from graphColoring import COLORING_ENGINES, tabu_coloring
+from graphDecomposition import biconnected_components, color_components, connected_components
+from instrumentation import NULL_STATS
+from scheduleCache import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def _read_enrollment_chunks(source, chunk_size, student_column, course_column):
+    # Yield (students, courses) lists of at most chunk_size enrollment rows
+    if isinstance(source, (str, os.PathLike)):
+        if str(source).endswith('.parquet'):
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size, columns=[student_column, course_column])
+            for batch in batches:
+                yield batch.column(student_column).to_pylist(), batch.column(course_column).to_pylist()
+            return
+
+        with open(source, newline='') as file:
+            reader = csv.DictReader(file)
+            rows = ((row[student_column], row[course_column]) for row in reader)
+            yield from _read_enrollment_chunks(rows, chunk_size, student_column, course_column)
+        return
+
+    rows = iter(source)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        students, courses = zip(*chunk)
+        yield list(students), list(courses)
+
+
+def _co_enrollment(student_codes, course_ids, n_courses):
+    # Shared-student counts for every pair of courses (upper triangle) from one sparse product
+    from scipy import sparse
+
+    student_codes = np.asarray(student_codes)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(student_codes), dtype=np.int64), (student_codes, np.asarray(course_ids))),
+        shape=(int(student_codes.max()) + 1, n_courses),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1  # A repeated enrollment row counts once
+    return sparse.triu(incidence.T @ incidence, k=1, format='csr')
 
 
 class CourseGraph:
     def __init__(self):
-        self.graph = {}  # To store graph: course -> list of conflicts
-        self.courses = set()  # To store all courses
+        self.course_ids = {}  # Course name -> integer id (interned once)
+        self.course_names = []  # Integer id -> course name
+
+        # Conflicts added since the last freeze, as pairs of course ids with their weight and
+        # whether they are hard (same professor, same cohort) or soft (shared students)
+        self._pending_src = array('i')
+        self._pending_dst = array('i')
+        self._pending_weight = array('d')
+        self._pending_hard = array('b')
+
+        # Deduplicated, symmetric adjacency in CSR form: the conflicts of course i are
+        # indices[indptr[i]:indptr[i + 1]], with their weights and hard flags at the same positions
+        # in weights and hard
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.hard = np.zeros(0, dtype=bool)
+        self._frozen = True
+
+        # Conflicts added with add_conflict_incremental since the last freeze (course id -> ids)
+        self._recent = {}
+        self._recent_count = 0
+        self._fingerprint = None
+
+    @property
+    def courses(self):
+        # All courses (read-only view)
+        return self.course_ids.keys()
+
+    @property
+    def graph(self):
+        # Compatibility view: course -> list of conflicts
+        self.freeze()
+        names = self.course_names
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        return {names[i]: [names[j] for j in indices[indptr[i]:indptr[i + 1]]] for i in range(len(names))}
 
     def add_course(self, course):
-        if course not in self.graph:
-            self.graph[course] = []
-            self.courses.add(course)
-
-    def add_conflict(self, course1, course2):
-        if course1 in self.courses and course2 in self.courses:
-            self.graph[course1].append(course2)
-            self.graph[course2].append(course1)
-
-    def welsh_powell_algorithm(self):
-        # Sort the courses based on the number of conflicts (descending order)
-        sorted_courses = sorted(self.graph, key=lambda x: len(self.graph[x]), reverse=True)
-        
-        result = {}  # To store the color (or time slot) assigned to each course
-        color = 0  # Initialize the first color (or time slot)
-
-        # Iterate over each course in the sorted list
-        for course in sorted_courses:
-            if course not in result:
-                # Assign a color to the course if it hasn't been colored yet
-                result[course] = color
-                
-                # Go through all other courses to assign the same color if there's no conflict
-                for neighbor in sorted_courses:
-                    # Check if neighbor hasn't been colored and doesn't conflict with any other course of the same color
-                    if neighbor not in result and all(result.get(conflict) != color for conflict in self.graph[neighbor]):
-                        result[neighbor] = color
-                # Increment color for the next set of non-conflicting courses
-                color += 1
+        if course not in self.course_ids:
+            self.course_ids[course] = len(self.course_names)
+            self.course_names.append(course)
+            self._frozen = False
+
+    def add_conflict(self, course1, course2, weight=1, hard=False):
+        # Hard conflicts must never share a color; soft ones only cost their weight when they do
+        # (see optimize_coloring). The classic engines keep every conflict apart
+        if course1 in self.course_ids and course2 in self.course_ids:
+            self._pending_src.append(self.course_ids[course1])
+            self._pending_dst.append(self.course_ids[course2])
+            self._pending_weight.append(weight)
+            self._pending_hard.append(bool(hard))
+            self._frozen = False
+
+    def add_conflicts(self, conflicts):
+        # Bulk version of add_conflict for an iterable of (course1, course2),
+        # (course1, course2, weight) or (course1, course2, weight, hard) tuples
+        course_ids = self.course_ids
+        for course1, course2, *extra in conflicts:
+            if course1 in course_ids and course2 in course_ids:
+                self._pending_src.append(course_ids[course1])
+                self._pending_dst.append(course_ids[course2])
+                self._pending_weight.append(extra[0] if extra else 1)
+                self._pending_hard.append(bool(extra[1]) if len(extra) > 1 else False)
+        self._frozen = False
+
+    def _add_conflict_ids(self, src, dst, weights, hard=False):
+        # Bulk path for conflicts that are already NumPy arrays of course ids
+        self._pending_src.frombytes(np.asarray(src, dtype=np.int32).tobytes())
+        self._pending_dst.frombytes(np.asarray(dst, dtype=np.int32).tobytes())
+        self._pending_weight.frombytes(np.asarray(weights, dtype=np.float64).tobytes())
+        self._pending_hard.frombytes(np.broadcast_to(np.asarray(hard, dtype=np.int8), np.shape(src)).tobytes())
+        self._frozen = False
+
+    @classmethod
+    def from_enrollments(cls, source, chunk_size=100000, student_column='student', course_column='course',
+                         grouped=True, min_shared=1):
+        # Build the conflict graph from (student, course) enrollment rows: two courses conflict
+        # when they share at least min_shared students, and the shared-student count is kept
+        # as the conflict weight.
+        # source is a CSV path, a Parquet path (needs pyarrow) or an iterable of pairs.
+        # Co-enrollment is one sparse product of the student x course incidence matrix per chunk.
+        # With grouped=True the rows of each student must be contiguous (checked inside each chunk
+        # only), so memory stays bounded by the chunk size; with grouped=False every row is kept
+        # and the product is done once at the end.
+        from scipy import sparse
+
+        course_graph = cls()
+        shared = sparse.csr_matrix((0, 0), dtype=np.int64)
+        pending_students, pending_courses = [], []
+        all_students, all_courses = array('i'), array('i')
+        student_ids = {}
+
+        def accumulate(shared, student_codes, course_ids):
+            n = len(course_graph.course_names)
+            chunk_shared = _co_enrollment(student_codes, course_ids, n)
+            shared.resize((n, n))
+            return shared + chunk_shared
+
+        for students, courses in _read_enrollment_chunks(source, chunk_size, student_column, course_column):
+            for course in dict.fromkeys(courses):
+                course_graph.add_course(course)
+            course_ids = [course_graph.course_ids[course] for course in courses]
+
+            if not grouped:
+                all_students.extend(student_ids.setdefault(student, len(student_ids)) for student in students)
+                all_courses.extend(course_ids)
+                continue
+
+            students = pending_students + list(students)
+            course_ids = pending_courses + course_ids
+            codes = np.unique(np.asarray(students), return_inverse=True)[1].ravel()
+
+            # Every student must form a single run of rows; the first run continues the last student
+            # of the previous chunk
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            if len(np.unique(codes[starts])) != len(starts):
+                raise ValueError("Enrollments are not grouped by student. Use grouped=False.")
+            starts = starts.tolist()
+
+            # The last student may continue in the next chunk
+            last = starts[-1]
+            if last:
+                shared = accumulate(shared, codes[:last], course_ids[:last])
+            pending_students, pending_courses = students[last:], course_ids[last:]
+
+        if pending_students:
+            codes = np.unique(np.asarray(pending_students), return_inverse=True)[1].ravel()
+            shared = accumulate(shared, codes, pending_courses)
+        if len(all_students):
+            shared = accumulate(shared, np.frombuffer(all_students, dtype=np.int32),
+                                np.frombuffer(all_courses, dtype=np.int32))
+
+        shared = shared.tocoo()
+        keep = shared.data >= min_shared
+        course_graph._add_conflict_ids(shared.row[keep], shared.col[keep], shared.data[keep])
+        return course_graph.freeze()
+
+    def freeze(self):
+        # Merge the pending conflicts into the CSR arrays, dropping self-conflicts and duplicates
+        if self._frozen:
+            return self
+
+        n = len(self.course_names)
+        old_n = len(self.indptr) - 1
+        old_rows = np.repeat(np.arange(old_n, dtype=np.int64), np.diff(self.indptr))
+        src = np.concatenate([old_rows, np.frombuffer(self._pending_src, dtype=np.int32)])
+        dst = np.concatenate([self.indices, np.frombuffer(self._pending_dst, dtype=np.int32)])
+        weights = np.concatenate([self.weights, np.frombuffer(self._pending_weight, dtype=np.float64)])
+        hard = np.concatenate([self.hard, np.frombuffer(self._pending_hard, dtype=np.int8).astype(bool)])
+
+        # Each undirected conflict is stored once as (low, high) and deduplicated by a single key;
+        # a conflict added several times keeps its largest weight, and is hard if any copy is
+        low = np.minimum(src, dst).astype(np.int64)
+        high = np.maximum(src, dst).astype(np.int64)
+        keep = low != high
+        keys = low[keep] * n + high[keep]
+        weights = weights[keep]
+        hard = hard[keep]
+        order = np.argsort(keys, kind='stable')
+        keys, starts = np.unique(keys[order], return_index=True)
+        weights = np.maximum.reduceat(weights[order], starts) if len(keys) else weights
+        hard = np.logical_or.reduceat(hard[order], starts) if len(keys) else hard
+        low, high = keys // n, keys % n
+
+        # Store both directions, sorted by source course
+        src = np.concatenate([low, high])
+        dst = np.concatenate([high, low])
+        order = np.argsort(src * n + dst, kind='stable')
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self.indices = dst[order].astype(np.int32)
+        self.weights = np.concatenate([weights, weights])[order]
+        self.hard = np.concatenate([hard, hard])[order]
+
+        self._pending_src = array('i')
+        self._pending_dst = array('i')
+        self._pending_weight = array('d')
+        self._pending_hard = array('b')
+        self._frozen = True
+        self._recent = {}
+        self._recent_count = 0
+        self._fingerprint = None
+        return self
+
+    def fingerprint(self):
+        # Canonical hash of the courses and the deduplicated, weighted conflicts. Course ids depend
+        # on insertion order, so conflicts are renumbered by the sorted course names first
+        self.freeze()
+        if self._fingerprint is None:
+            names = np.array(self.course_names, dtype=object)
+            order = np.argsort(names.astype(str), kind='stable')
+            rank = np.empty(len(names), dtype=np.int64)
+            rank[order] = np.arange(len(names))
+
+            rows = rank[np.repeat(np.arange(len(names)), np.diff(self.indptr))]
+            columns = rank[self.indices]
+            upper = rows < columns
+            keys = rows[upper] * len(names) + columns[upper]
+            key_order = np.argsort(keys)
+
+            digest = hashlib.sha256()
+            digest.update('\0'.join(map(str, names[order])).encode())
+            digest.update(keys[key_order].tobytes())
+            digest.update(self.weights[upper][key_order].tobytes())
+            if self.hard.any():
+                digest.update(self.hard[upper][key_order].tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def _conflict_ids(self, i):
+        # Conflicts of course i in the CSR arrays plus the ones added incrementally since the last freeze
+        conflicts = set(self.indices[self.indptr[i]:self.indptr[i + 1]].tolist()) if i < len(self.indptr) - 1 else set()
+        return conflicts | self._recent.get(i, set())
+
+    def add_conflict_incremental(self, course1, course2, weight=1, hard=False):
+        # Add a conflict and repair the current coloring locally instead of recoloring the graph:
+        # only an endpoint left without a valid color is recolored, with the lowest color its
+        # neighbors don't use. Returns the changes as {course: (old color, new color)}
+        if course1 not in self.course_ids or course2 not in self.course_ids or course1 == course2:
+            return {}
+
+        # Conflicts added in bulk must be merged first so the neighborhoods below are complete
+        if len(self._pending_src) != self._recent_count:
+            self.freeze()
+
+        id1, id2 = self.course_ids[course1], self.course_ids[course2]
+        self.add_conflict(course1, course2, weight, hard)
+        self._recent.setdefault(id1, set()).add(id2)
+        self._recent.setdefault(id2, set()).add(id1)
+        self._recent_count += 1
+
+        colors = getattr(self, 'colors', {})
+        changes = {}
+
+        def recolor(course):
+            used = {colors.get(self.course_names[j]) for j in self._conflict_ids(self.course_ids[course])}
+            color = next(color for color in itertools.count() if color not in used)
+            changes[course] = (colors.get(course), color)
+            colors[course] = color
+
+        # New courses get a color first, then the endpoint with fewer conflicts gives way
+        for course in (course1, course2):
+            if course not in colors:
+                recolor(course)
+        if colors[course1] == colors[course2]:
+            degree1, degree2 = len(self._conflict_ids(id1)), len(self._conflict_ids(id2))
+            recolor(course1 if degree1 < degree2 else course2)
+
+        self.colors = colors
+        return changes
+
+    def conflict_weight(self, course1, course2):
+        # Weight of the conflict between two courses (0 if they don't conflict)
+        self.freeze()
+        i, j = self.course_ids[course1], self.course_ids[course2]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        position = start + np.searchsorted(self.indices[start:end], j)
+        if position < end and self.indices[position] == j:
+            return self.weights[position].item()
+        return 0
+
+    def degrees(self):
+        # Number of distinct conflicts of each course, by course id
+        self.freeze()
+        return np.diff(self.indptr)
+
+    def connected_components(self):
+        # Groups of courses linked by conflicts (e.g. departments), largest first
+        self.freeze()
+        labels = connected_components(self.indptr, self.indices)
+        components = [[] for _ in range(labels.max(initial=-1) + 1)]
+        for course, label in zip(self.course_names, labels.tolist()):
+            components[label].append(course)
+        return sorted(components, key=len, reverse=True)
+
+    def biconnected_components(self):
+        # Biconnected blocks (lists of courses) and articulation points: the courses whose
+        # removal would split their component
+        self.freeze()
+        blocks, articulation_points = biconnected_components(self.indptr, self.indices)
+        names = self.course_names
+        return [[names[i] for i in block] for block in blocks], [names[i] for i in articulation_points]
+
+    def welsh_powell_algorithm(self, engine='welsh_powell', cache=None, stats=None, by_component=False, workers=None):
+        # Pick the coloring engine ('welsh_powell', 'dsatur' or 'smallest_last').
+        # With by_component=True every connected component is colored on its own, in a pool of
+        # workers processes for the large ones, and the colorings are merged with a shared palette
+        if engine not in COLORING_ENGINES:
+            raise ValueError(f"Unknown coloring engine '{engine}'. Choose one of: {', '.join(COLORING_ENGINES)}")
+        stats = NULL_STATS if stats is None else stats
+
+        with stats.run('coloring'):
+            with stats.timer('graph_build'):
+                self.freeze()
+
+            # With a ScheduleCache, the same graph is only colored once. The engines break ties by
+            # course id, so the insertion order of the courses is part of the key
+            key = None
+            if cache is not None:
+                key = fingerprint('coloring', engine, by_component, self.course_names, self.fingerprint())
+            result = cache.get(key) if cache is not None else None
+            if cache is not None:
+                stats.count('cache_hits' if result is not None else 'cache_misses')
+
+            if result is None:
+                if by_component:
+                    colors = color_components(self.indptr, self.indices, engine, workers, stats=stats)
+                else:
+                    colors = COLORING_ENGINES[engine](self.indptr, self.indices, stats)
+                result = dict(zip(self.course_names, colors))  # Color (or time slot) of each course
+                if cache is not None:
+                    cache.put(key, result)
+            result = dict(result)
+            color = max(result.values(), default=-1) + 1  # Number of colors (or time slots) used
 
         self.colors = result  # Make sure to assign the result to self.colors
-        print("Chromatic number:", color)
-        print("Colors assigned to courses:", result)
+        logger.info("Chromatic number: %d", color)
+        logger.debug("Colors assigned to courses: %s", result)
         return result
 
-    # Visualization method updated with buttons for interactivity
-    def visualize_graph(self):
-    
-        # Create an undirected graph using the NetworkX library
-        G = nx.Graph()
-
-        # Add nodes to the graph to represent each course
-        for course in self.courses:
-            G.add_node(course)
-
-        # Add edges to the graph to represent conflicts between courses
-        for course, conflicts in self.graph.items():
-            for conflict in conflicts:
-                G.add_edge(course, conflict)
-
-        # Calculate the layout of nodes using the spring_layout algorithm from NetworkX
-        pos = nx.spring_layout(G, k=1.5, iterations=50)
-
-        # Color configuration for nodes based on the color assignment of courses
-        color_map = plt.cm.get_cmap('viridis', max(self.colors.values()) + 1)
-        norm = mcolors.Normalize(vmin=0, vmax=max(self.colors.values()))
-
-        # Create a figure and axes for visualization
-        fig, ax = plt.subplots(figsize=(14, 8))
-        fig.canvas.manager.set_window_title('Course Conflict Graph')
-        fig.tight_layout()
-        plt.subplots_adjust(bottom=0.2)
-
-        # Function to update the graph visualization at each step
-        def update_graph(index):
-            ax.clear()
-            ax.set_title(f"Course Conflict Graph - Step {index + 1}" if index >= 0 else "Course Conflict Graph - No Color", fontweight='bold', pad=3)
-            
-            # Assign colors to nodes based on the current step
-            node_colors = [color_map(norm(self.colors.get(node, 0))) if self.colors.get(node) <= index else 'lightgrey' for node in G.nodes()]
-            
-            # Draw the graph with node labels, colors, and other attributes
-            nx.draw(G, pos, ax=ax, with_labels=True, node_color=node_colors, edge_color='gray', node_size=2500, font_size=12, font_color='black')
-            fig.canvas.draw_idle()
-
-        # Initial drawing of the graph without colors
-        update_graph(-1)
-
-        class IndexTracker(object):
-            def __init__(self, course_graph):
-                self.index = -1  # Start from -1 to represent the uncolored state
-                self.course_graph = course_graph
-
-            def next(self, event):
-                if self.index < max(self.course_graph.colors.values()):
-                    self.index += 1
-                update_graph(self.index)
-
-            def prev(self, event):
-                if self.index > -1:  # Allows the index to go back to the uncolored state
-                    self.index -= 1
-                update_graph(self.index)
-
-        # Buttons callback functions
-        tracker = IndexTracker(self) 
-        axprev = plt.axes([0.7, 0.05, 0.1, 0.075])
-        axnext = plt.axes([0.81, 0.05, 0.1, 0.075])
-        bnext = Button(axnext, 'Next')
-        bnext.on_clicked(tracker.next)
-        bprev = Button(axprev, 'Prev')
-        bprev.on_clicked(tracker.prev)
-        
-        plt.show()
-      
-
-# ---------------------------- VISUALIZATION ----------------------------
-    # Without colors + with colors -> animation
-    # def visualize_graph(self):
-        # G = nx.Graph()
-        
-        # # Añade nodos y aristas al grafo G
-        # for course in self.courses:
-        #     G.add_node(course)
-        # for course, conflicts in self.graph.items():
-        #     for conflict in conflicts:
-        #         G.add_edge(course, conflict)
-        
-        # pos = nx.spring_layout(G, k=1.5, iterations=50)
-
-        # # Prepara la figura
-        # plt.figure(figsize=(12, 8))
-        # plt.title("Course Conflict Graph")
-
-        # # Dibuja el grafo sin colores primero
-        # nx.draw(G, pos, with_labels=True, node_color='lightblue', edge_color='gray', node_size=2500, font_weight='bold')
-        # plt.pause(5)  # Pausa de 2 segundos
-
-        # # Dibuja el grafo con colores
-        # color_map = plt.cm.get_cmap('viridis', max(self.colors.values()) + 1)
-        # norm = mcolors.Normalize(vmin=0, vmax=max(self.colors.values()))
-
-        # for color in range(max(self.colors.values()) + 1):
-        #     # Define los colores de los nodos en este paso
-        #     node_colors = [color_map(norm(self.colors[node])) if self.colors[node] <= color else 'lightblue' for node in G.nodes()]
-
-        #     # Actualiza la figura
-        #     plt.clf()
-        #     plt.title(f"Course Conflict Graph - Coloring Step {color+1}")
-        #     nx.draw(G, pos, with_labels=True, node_color=node_colors, edge_color='gray', node_size=2500, font_weight='bold')
-        #     plt.pause(1)  # Pausa para ver la transición
-
-        # plt.show()
-
-# ---------------------------- INDIVIDUAL VISUALIZATION ----------------------------
-    # With colors
-    def visualize_graph_with_colors(self):
-        # Create a networkx graph from the course graph
-        G = nx.Graph()
-        
-        # Add nodes
-        for course in self.courses:
-            G.add_node(course)
-        
-        # Add edges
-        for course, conflicts in self.graph.items():
-            for conflict in conflicts:
-                G.add_edge(course, conflict)
-        
-        # Define node colors using the colors assigned by Welsh-Powell algorithm
-        node_colors = [self.colors[course] for course in self.courses]
-        
-        # Generate a color map
-        color_map = plt.cm.get_cmap('viridis', max(node_colors) + 1)
-
-        # Use spring layout for better spacing
-        pos = nx.spring_layout(G, k=1.5, iterations=50)  # Ajusta los valores de 'k' y 'iterations' según sea necesario
-
-        # Draw the graph
-        plt.figure(figsize=(12, 8))
-        nx.draw(G, pos, with_labels=True, node_color=node_colors, cmap=color_map, edge_color='gray', node_size=2500, font_size=10)
-        plt.title("Course Conflict Graph")
-        plt.show()
-
-    # Without colors
-    def visualize_graph_without_colors(self):
-        # Create a networkx graph from the course graph
-        G = nx.Graph()
-        
-        # Add nodes
-        for course in self.courses:
-            G.add_node(course)
-        
-        # Add edges
-        for course, conflicts in self.graph.items():
-            for conflict in conflicts:
-                G.add_edge(course, conflict)
-        
-        # Use spring layout for better spacing
-        pos = nx.spring_layout(G, k=1.5, iterations=100)  # You can adjust 'k' and 'iterations' for different spacing
-        
-        # Draw the graph
-        plt.figure(figsize=(10, 8))
-        nx.draw(G, pos, with_labels=True, node_color='lightblue', edge_color='gray', node_size=2500, font_size=10)
-        plt.title("Course Conflict Graph")
-        plt.show()
\ No newline at end of file
+    def optimize_coloring(self, n_colors, max_iterations=100000, time_budget=None, seed=0, cache=None, stats=None):
+        # Color the courses with at most n_colors colors (the slot groups actually available),
+        # keeping hard conflicts apart and minimizing the weight of the soft conflicts that end up
+        # sharing a color. Sets self.coloring_cost to (hard conflicts left, soft weight left)
+        if n_colors < 1:
+            raise ValueError("The color budget must be at least 1.")
+        stats = NULL_STATS if stats is None else stats
+
+        with stats.run('optimize_coloring'):
+            with stats.timer('graph_build'):
+                self.freeze()
+
+            key = None
+            if cache is not None:
+                key = fingerprint('tabu', n_colors, max_iterations, seed, self.course_names, self.fingerprint())
+            cached = cache.get(key) if cache is not None else None
+            if cache is not None:
+                stats.count('cache_hits' if cached is not None else 'cache_misses')
+
+            # Results under a time budget depend on the machine, so only iteration-bound runs are cached
+            if cached is None:
+                colors, hard_left, soft_left = tabu_coloring(self.indptr, self.indices, self.weights, self.hard,
+                                                             n_colors, max_iterations, time_budget, seed, stats)
+                cached = (dict(zip(self.course_names, colors)), hard_left, soft_left)
+                if cache is not None and time_budget is None:
+                    cache.put(key, cached)
+            result, hard_left, soft_left = cached
+            result = dict(result)
+
+        self.colors = result
+        self.coloring_cost = (hard_left, soft_left)
+        if hard_left:
+            logger.warning("%d hard conflicts could not be separated with %d colors.", hard_left, n_colors)
+        logger.info("Soft conflict weight with %d colors: %g", n_colors, soft_left)
+        return result
+
+    # ---------------------------- VISUALIZATION ----------------------------
+    # Plotting lives in graphPlotting and is only imported when a plot is requested, so
+    # coloring and scheduling don't pay for matplotlib/networkx or need a display
+    def visualize_graph(self, layout_cache=None):
+        import graphPlotting
+        graphPlotting.visualize_graph(self, layout_cache)
+
+    def visualize_graph_with_colors(self, layout_cache=None):
+        import graphPlotting
+        graphPlotting.visualize_graph_with_colors(self, layout_cache)
+
+    def visualize_graph_without_colors(self, layout_cache=None):
+        import graphPlotting
+        graphPlotting.visualize_graph_without_colors(self, layout_cache)
+
+    def export_coloring_steps(self, directory, formats=('png',), gif=True, layout_cache=None):
+        # Headless rendering of every coloring step to files (PNG/SVG/PDF and an animated GIF)
+        import graphPlotting
+        return graphPlotting.export_coloring_steps(self, directory, formats, gif, layout_cache)
@@ -0,0 +1,244 @@
+import heapq
+import random
+import time
+import numpy as np
+from instrumentation import NULL_STATS
+
+# Coloring engines for the course conflict graph.
+# Every engine works on integer course ids over the CSR arrays of CourseGraph: the conflicts
+# of course v are indices[indptr[v]:indptr[v + 1]], and the result is a list with the color
+# (time slot group) of each course.
+# Forbidden colors are kept per course as an int bitset that is updated as colors are
+# assigned, so checking a candidate color never rescans the neighbors.
+# Every engine takes an optional instrumentation.Stats for its phase timers and counters.
+
+
+def _lowest_free_color(forbidden):
+    # Position of the lowest zero bit of the forbidden colors bitset
+    return (~forbidden & (forbidden + 1)).bit_length() - 1
+
+
+def _as_lists(indptr, indices):
+    # Plain Python lists are much faster than NumPy scalars inside the per-course loops
+    if isinstance(indptr, list) and isinstance(indices, list):
+        return indptr, indices
+    return np.asarray(indptr).tolist(), np.asarray(indices).tolist()
+
+
+def greedy_coloring(indptr, indices, order, stats=NULL_STATS):
+    # First-fit coloring: each course takes the lowest color none of its neighbors uses
+    stats.count('neighbor_checks', len(indices))
+    indptr, indices = _as_lists(indptr, indices)
+    colors = [-1] * (len(indptr) - 1)
+    forbidden = [0] * (len(indptr) - 1)
+
+    for course in order:
+        color = _lowest_free_color(forbidden[course])
+        colors[course] = color
+
+        # Mark the color as used for every neighbor in a single walk over the conflicts
+        bit = 1 << color
+        for neighbor in indices[indptr[course]:indptr[course + 1]]:
+            forbidden[neighbor] |= bit
+
+    return colors
+
+
+def welsh_powell(indptr, indices, stats=NULL_STATS):
+    # Sort the courses based on the number of conflicts (descending order)
+    with stats.timer('sort'):
+        degrees = np.diff(indptr)
+        order = np.argsort(-degrees, kind='stable').tolist()
+
+    # Welsh-Powell fills one color per pass over the sorted list; a course only sees the
+    # courses before it when its turn comes, so first-fit in the same order gives the
+    # same color classes in a single pass
+    with stats.timer('color'):
+        return greedy_coloring(indptr, indices, order, stats)
+
+
+def dsatur(indptr, indices, stats=NULL_STATS):
+    # DSATUR: always color the course with the most distinct neighbor colors (saturation),
+    # breaking ties by degree. Courses are kept in buckets by saturation, each bucket a heap
+    # by degree; entries left behind when a course moves to a higher bucket are skipped
+    stats.count('neighbor_checks', len(indices))
+    degrees = np.diff(indptr).tolist()
+    indptr, indices = _as_lists(indptr, indices)
+    n = len(degrees)
+    colors = [-1] * n
+    forbidden = [0] * n
+    saturation = [0] * n
+
+    buckets = [[(-degrees[course], course) for course in range(n)]]
+    heapq.heapify(buckets[0])
+    top = 0
+    queue_pops = 0
+
+    with stats.timer('color'):
+        for _ in range(n):
+            # Pop the highest saturation course that is still uncolored and up to date
+            while True:
+                while not buckets[top]:
+                    top -= 1
+                _, course = heapq.heappop(buckets[top])
+                queue_pops += 1
+                if colors[course] == -1 and saturation[course] == top:
+                    break
+
+            color = _lowest_free_color(forbidden[course])
+            colors[course] = color
+
+            bit = 1 << color
+            for neighbor in indices[indptr[course]:indptr[course + 1]]:
+                if colors[neighbor] == -1 and not forbidden[neighbor] & bit:
+                    forbidden[neighbor] |= bit
+                    saturation[neighbor] += 1
+                    if saturation[neighbor] == len(buckets):
+                        buckets.append([])
+                    heapq.heappush(buckets[saturation[neighbor]], (-degrees[neighbor], neighbor))
+                    top = max(top, saturation[neighbor])
+
+    stats.count('queue_pops', queue_pops)
+    return colors
+
+
+def smallest_last(indptr, indices, stats=NULL_STATS):
+    # Smallest-last: repeatedly remove the course with the fewest remaining conflicts and
+    # color in the reverse removal order. Buckets by remaining degree make each removal O(1)
+    degrees = np.diff(indptr).tolist()
+    n = len(degrees)
+
+    with stats.timer('sort'):
+        stats.count('neighbor_checks', len(indices))
+        indptr, indices = _as_lists(indptr, indices)
+        buckets = [{} for _ in range(max(degrees, default=0) + 1)]
+        for course in range(n):
+            buckets[degrees[course]][course] = None
+
+        removed = [False] * n
+        order = []
+        low = 0
+
+        for _ in range(n):
+            while not buckets[low]:
+                low += 1
+            course, _ = buckets[low].popitem()
+            removed[course] = True
+            order.append(course)
+
+            for neighbor in indices[indptr[course]:indptr[course + 1]]:
+                if not removed[neighbor]:
+                    del buckets[degrees[neighbor]][neighbor]
+                    degrees[neighbor] -= 1
+                    buckets[degrees[neighbor]][neighbor] = None
+                    low = min(low, degrees[neighbor])
+
+        order.reverse()
+
+    with stats.timer('color'):
+        return greedy_coloring(indptr, indices, order, stats)
+
+
+# ---------------------------- FIXED BUDGET OPTIMIZATION ----------------------------
+def _conflict_weights(weights, hard, hard_penalty):
+    # Cost of each CSR conflict when both courses share a color: hard conflicts cost hard_penalty
+    weights = np.asarray(weights, dtype=np.float64)
+    if hard is None:
+        return weights.tolist()
+    return np.where(np.asarray(hard, dtype=bool), hard_penalty, weights).tolist()
+
+
+def tabu_coloring(indptr, indices, weights, hard, n_colors, max_iterations=100000, time_budget=None, seed=0,
+                  stats=NULL_STATS):
+    # Color the courses with at most n_colors colors, minimizing the total weight of the soft
+    # conflicts whose courses share a color; a hard conflict costs more than all soft ones
+    # together, so hard conflicts are only left when n_colors is too small for them.
+    # Tabu search (TabuCol): gamma[v][c] is the weight of the conflicts of v with color c, so the
+    # cost change of moving v to c is gamma[v][c] - gamma[v][colors[v]], and a move updates
+    # gamma in O(degree). Returns (colors, hard conflicts left, soft weight left)
+    rng = random.Random(seed)
+    indptr, indices = _as_lists(indptr, indices)
+    n = len(indptr) - 1
+    hard_penalty = float(np.sum(weights)) + 1
+    costs = _conflict_weights(weights, hard, hard_penalty)
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+
+    # Start from a first-fit in degree order that takes the cheapest color once all are used
+    gamma = [[0.0] * n_colors for _ in range(n)]
+    colors = [0] * n
+    with stats.timer('sort'):
+        order = np.argsort(-np.diff(indptr), kind='stable').tolist()
+    with stats.timer('color'):
+        for course in order:
+            row = gamma[course]
+            color = min(range(n_colors), key=row.__getitem__)
+            colors[course] = color
+            for position in range(indptr[course], indptr[course + 1]):
+                gamma[indices[position]][color] += costs[position]
+    cost = sum(gamma[course][colors[course]] for course in range(n)) / 2
+    conflicting = {course for course in range(n) if gamma[course][colors[course]] > 0}
+
+    best_cost, best_colors = cost, list(colors)
+    tabu = {}  # (course, color) -> first iteration the move is allowed again
+    iterations = 0
+
+    with stats.timer('optimize'):
+        while conflicting and iterations < max_iterations:
+            if deadline is not None and not iterations % 256 and time.monotonic() > deadline:
+                break
+            iterations += 1
+
+            # Best non-tabu move among the courses in conflict; a tabu move is allowed when it
+            # improves on the best cost found so far (aspiration)
+            move, move_delta = None, None
+            for course in conflicting:
+                row = gamma[course]
+                current_color = colors[course]
+                current = row[current_color]
+                for color in range(n_colors):
+                    if color == current_color:
+                        continue
+                    delta = row[color] - current
+                    if move_delta is not None and delta >= move_delta:
+                        continue
+                    if tabu.get((course, color), 0) > iterations and cost + delta >= best_cost:
+                        continue
+                    move, move_delta = (course, color), delta
+            if move is None:
+                continue
+
+            course, color = move
+            old_color = colors[course]
+            colors[course] = color
+            cost += move_delta
+            tabu[course, old_color] = iterations + int(0.6 * len(conflicting)) + rng.randint(1, 10)
+
+            # O(degree) update of gamma and of the courses in conflict
+            for position in range(indptr[course], indptr[course + 1]):
+                neighbor = indices[position]
+                row = gamma[neighbor]
+                row[old_color] -= costs[position]
+                row[color] += costs[position]
+                if row[colors[neighbor]] > 0:
+                    conflicting.add(neighbor)
+                else:
+                    conflicting.discard(neighbor)
+            if gamma[course][color] > 0:
+                conflicting.add(course)
+            else:
+                conflicting.discard(course)
+
+            if cost < best_cost - 1e-9:
+                best_cost, best_colors = cost, list(colors)
+
+    stats.count('tabu_iterations', iterations)
+    hard_left = int(best_cost // hard_penalty)
+    return best_colors, hard_left, round(best_cost - hard_left * hard_penalty, 9)
+
+
+# Available engines by name
+COLORING_ENGINES = {
+    'welsh_powell': welsh_powell,
+    'dsatur': dsatur,
+    'smallest_last': smallest_last,
+}
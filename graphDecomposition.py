@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from graphColoring import COLORING_ENGINES, _as_lists
+from instrumentation import NULL_STATS
+
+# Decomposition of the course conflict graph, on the same CSR arrays as graphColoring.
+# Courses in different connected components never conflict, so every component can be colored
+# on its own, starting from color 0 each time (the palette is shared), and the colorings merged
+# as they are. Biconnected blocks and articulation points show the courses whose removal would
+# split a component, e.g. the one course linking two departments.
+
+
+def connected_components(indptr, indices):
+    # Component label of every course (labels numbered in order of their lowest course id), by
+    # breadth-first search over the CSR arrays
+    indptr, indices = _as_lists(indptr, indices)
+    n = len(indptr) - 1
+    labels = [-1] * n
+    n_components = 0
+
+    for root in range(n):
+        if labels[root] != -1:
+            continue
+        labels[root] = n_components
+        queue = [root]
+        for course in queue:  # The queue grows while it is walked
+            for neighbor in indices[indptr[course]:indptr[course + 1]]:
+                if labels[neighbor] == -1:
+                    labels[neighbor] = n_components
+                    queue.append(neighbor)
+        n_components += 1
+
+    return np.array(labels, dtype=np.int64)
+
+
+def biconnected_components(indptr, indices):
+    # Biconnected blocks (lists of course ids) and articulation points (sorted course ids), by an
+    # iterative Hopcroft-Tarjan search. Courses without conflicts are blocks of their own
+    indptr, indices = _as_lists(indptr, indices)
+    n = len(indptr) - 1
+    discovered = [-1] * n
+    low = [0] * n
+    articulation_points = set()
+    blocks = []
+    edges = []  # Tree and back edges of the blocks still open
+    clock = 0
+
+    for root in range(n):
+        if discovered[root] != -1:
+            continue
+        discovered[root] = low[root] = clock
+        clock += 1
+        if indptr[root] == indptr[root + 1]:
+            blocks.append([root])
+            continue
+
+        root_children = 0
+        stack = [(root, -1, indptr[root])]  # (course, parent, next conflict position)
+        while stack:
+            course, parent, position = stack[-1]
+            if position < indptr[course + 1]:
+                stack[-1] = (course, parent, position + 1)
+                neighbor = indices[position]
+                if discovered[neighbor] == -1:
+                    discovered[neighbor] = low[neighbor] = clock
+                    clock += 1
+                    edges.append((course, neighbor))
+                    stack.append((neighbor, course, indptr[neighbor]))
+                    if course == root:
+                        root_children += 1
+                elif neighbor != parent and discovered[neighbor] < discovered[course]:
+                    low[course] = min(low[course], discovered[neighbor])
+                    edges.append((course, neighbor))
+                continue
+
+            # All conflicts of the course are explored: close the block it hangs from, if any
+            stack.pop()
+            if not stack:
+                continue
+            above = stack[-1][0]
+            low[above] = min(low[above], low[course])
+            if low[course] >= discovered[above]:
+                if above != root:
+                    articulation_points.add(above)
+                block = set()
+                while True:
+                    edge = edges.pop()
+                    block.update(edge)
+                    if edge == (above, course):
+                        break
+                blocks.append(sorted(block))
+
+        if root_children > 1:
+            articulation_points.add(root)
+
+    return blocks, sorted(articulation_points)
+
+
+def component_csr(indptr, indices, labels):
+    # Renumber the courses so every component is contiguous. Returns (order, starts, indptr,
+    # indices): order lists the course ids component by component, component c holds positions
+    # starts[c]:starts[c + 1], and the CSR arrays use positions in order as course ids
+    indptr = np.asarray(indptr)
+    indices = np.asarray(indices)
+    order = np.argsort(labels, kind='stable')
+    starts = np.searchsorted(labels[order], np.arange(labels.max(initial=-1) + 2))
+
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    degrees = np.diff(indptr)[order]
+    new_indptr = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=new_indptr[1:])
+
+    # Gather the conflict ranges of the courses in their new order in one vectorized step
+    gather = np.repeat(indptr[:-1][order] - new_indptr[:-1], degrees) + np.arange(new_indptr[-1])
+    return order, starts, new_indptr, position[indices[gather]].astype(np.int32)
+
+
+def _color_component(engine, indptr, indices):
+    # Worker for color_components
+    return COLORING_ENGINES[engine](indptr, indices)
+
+
+def color_components(indptr, indices, engine='welsh_powell', workers=None, min_parallel_size=10000,
+                     stats=NULL_STATS):
+    # Color every connected component on its own with the engine and merge the colorings; all
+    # components reuse colors from 0, so the number of colors is that of the hardest component.
+    # With workers, components with at least min_parallel_size courses + conflicts are colored
+    # in a process pool while the small ones are colored here
+    with stats.timer('components'):
+        labels = connected_components(indptr, indices)
+        order, starts, indptr, indices = component_csr(indptr, indices, labels)
+    stats.count('components', len(starts) - 1)
+
+    colors = np.zeros(len(order), dtype=np.int64)
+    pieces = []
+    for component in range(len(starts) - 1):
+        start, end = starts[component], starts[component + 1]
+        sub_indptr = indptr[start:end + 1] - indptr[start]
+        sub_indices = indices[indptr[start]:indptr[end]] - start
+        pieces.append((start, end, sub_indptr, sub_indices))
+
+    # The engines time their own 'color' phase, so the whole loop is timed separately
+    with stats.timer('component_coloring'):
+        large = [piece for piece in pieces if workers and (piece[1] - piece[0]) + len(piece[3]) >= min_parallel_size]
+        futures = []
+        executor = ProcessPoolExecutor(max_workers=workers) if len(large) > 1 else None
+        try:
+            for start, end, sub_indptr, sub_indices in pieces:
+                if executor is not None and (end - start) + len(sub_indices) >= min_parallel_size:
+                    futures.append((start, end, executor.submit(_color_component, engine, sub_indptr, sub_indices)))
+                else:
+                    colors[order[start:end]] = COLORING_ENGINES[engine](sub_indptr, sub_indices, stats)
+            for start, end, future in futures:
+                colors[order[start:end]] = future.result()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    stats.count('parallel_components', len(futures))
+    return colors.tolist()
@@ -0,0 +1,193 @@
+import os
+import networkx as nx
+import matplotlib.colors as mcolors
+import matplotlib.pyplot as plt
+from matplotlib import animation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.widgets import Button
+from scheduleCache import fingerprint
+
+# Plots of the course conflict graph. Imported lazily by the CourseGraph.visualize_* methods,
+# so matplotlib and networkx are only loaded when a plot is requested.
+# The networkx graph is built in one go from the CSR arrays, the spring layout can be kept in a
+# ScheduleCache keyed by the graph fingerprint, and moving between coloring steps only changes
+# the node face colors instead of redrawing the whole graph.
+
+
+def to_networkx(course_graph):
+    # Create an undirected graph with a node per course and an edge per conflict
+    course_graph.freeze()
+    names = course_graph.course_names
+    indptr, indices = course_graph.indptr.tolist(), course_graph.indices.tolist()
+
+    G = nx.Graph()
+    G.add_nodes_from(names)
+    G.add_edges_from((names[i], names[j]) for i in range(len(names)) for j in indices[indptr[i]:indptr[i + 1]] if i < j)
+    return G
+
+
+def compute_layout(course_graph, G=None, k=1.5, iterations=50, seed=None, cache=None):
+    # Spring layout of the graph ({course: (x, y)}), reused from the cache when the graph is unchanged
+    key = fingerprint('layout', course_graph.fingerprint(), k, iterations, seed) if cache is not None else None
+    pos = cache.get(key) if cache is not None else None
+    if pos is None:
+        if G is None:
+            G = to_networkx(course_graph)
+        pos = {course: tuple(xy) for course, xy in nx.spring_layout(G, k=k, iterations=iterations, seed=seed).items()}
+        if cache is not None:
+            cache.put(key, pos)
+    return pos
+
+
+def _coloring(course_graph):
+    # Colors of the courses, once welsh_powell_algorithm has been run
+    colors = getattr(course_graph, 'colors', None)
+    if colors is None:
+        raise ValueError("The graph has not been colored yet. Run welsh_powell_algorithm first.")
+    return colors
+
+
+def _step_colors(nodes, colors, index):
+    # Face colors of the nodes at a coloring step: courses with a color up to index are painted
+    n_colors = max(colors.values(), default=0) + 1
+    color_map = plt.get_cmap('viridis', n_colors)
+    norm = mcolors.Normalize(vmin=0, vmax=max(n_colors - 1, 1))
+    return [color_map(norm(colors.get(node, 0))) if colors.get(node, 0) <= index else 'lightgrey' for node in nodes]
+
+
+def _step_title(index):
+    return f"Course Conflict Graph - Step {index + 1}" if index >= 0 else "Course Conflict Graph - No Color"
+
+
+def _draw(ax, G, pos, font_size=12):
+    # Draw edges and labels once and return the node collection, whose colors change per step
+    nx.draw_networkx_edges(G, pos, ax=ax, edge_color='gray')
+    nodes = nx.draw_networkx_nodes(G, pos, ax=ax, node_color='lightgrey', node_size=2500)
+    nx.draw_networkx_labels(G, pos, ax=ax, font_size=font_size, font_color='black')
+    ax.set_axis_off()
+    return nodes
+
+
+# Visualization method updated with buttons for interactivity
+def visualize_graph(course_graph, layout_cache=None):
+    colors = _coloring(course_graph)
+    G = to_networkx(course_graph)
+    pos = compute_layout(course_graph, G, k=1.5, iterations=50, cache=layout_cache)
+
+    # Create a figure and axes for visualization
+    fig, ax = plt.subplots(figsize=(14, 8))
+    fig.canvas.manager.set_window_title('Course Conflict Graph')
+    fig.tight_layout()
+    plt.subplots_adjust(bottom=0.2)
+
+    # The graph is drawn once; each step only recolors the nodes
+    nodes = _draw(ax, G, pos)
+    node_names = list(G.nodes())
+
+    def update_graph(index):
+        ax.set_title(_step_title(index), fontweight='bold', pad=3)
+        nodes.set_facecolor(_step_colors(node_names, colors, index))
+        fig.canvas.draw_idle()
+
+    # Initial drawing of the graph without colors
+    update_graph(-1)
+
+    class IndexTracker(object):
+        def __init__(self, course_graph):
+            self.index = -1  # Start from -1 to represent the uncolored state
+            self.course_graph = course_graph
+
+        def next(self, event):
+            if self.index < max(colors.values(), default=-1):
+                self.index += 1
+            update_graph(self.index)
+
+        def prev(self, event):
+            if self.index > -1:  # Allows the index to go back to the uncolored state
+                self.index -= 1
+            update_graph(self.index)
+
+    # Buttons callback functions
+    tracker = IndexTracker(course_graph)
+    axprev = plt.axes([0.7, 0.05, 0.1, 0.075])
+    axnext = plt.axes([0.81, 0.05, 0.1, 0.075])
+    bnext = Button(axnext, 'Next')
+    bnext.on_clicked(tracker.next)
+    bprev = Button(axprev, 'Prev')
+    bprev.on_clicked(tracker.prev)
+
+    plt.show()
+
+
+# With colors
+def visualize_graph_with_colors(course_graph, layout_cache=None):
+    colors = _coloring(course_graph)
+    G = to_networkx(course_graph)
+
+    # Define node colors using the colors assigned by Welsh-Powell algorithm
+    node_colors = [colors[course] for course in G.nodes()]
+
+    # Generate a color map
+    color_map = plt.get_cmap('viridis', max(node_colors, default=0) + 1)
+
+    # Use spring layout for better spacing
+    pos = compute_layout(course_graph, G, k=1.5, iterations=50, cache=layout_cache)
+
+    # Draw the graph
+    plt.figure(figsize=(12, 8))
+    nx.draw(G, pos, with_labels=True, node_color=node_colors, cmap=color_map, edge_color='gray', node_size=2500, font_size=10)
+    plt.title("Course Conflict Graph")
+    plt.show()
+
+
+# Without colors
+def visualize_graph_without_colors(course_graph, layout_cache=None):
+    G = to_networkx(course_graph)
+
+    # Use spring layout for better spacing
+    pos = compute_layout(course_graph, G, k=1.5, iterations=100, cache=layout_cache)
+
+    # Draw the graph
+    plt.figure(figsize=(10, 8))
+    nx.draw(G, pos, with_labels=True, node_color='lightblue', edge_color='gray', node_size=2500, font_size=10)
+    plt.title("Course Conflict Graph")
+    plt.show()
+
+
+# ---------------------------- HEADLESS EXPORT ----------------------------
+def export_coloring_steps(course_graph, directory, formats=('png',), gif=True, layout_cache=None,
+                          figsize=(14, 8), dpi=100, fps=1):
+    # Render every coloring step (no color, then one more color per step) without a display:
+    # one file per step and format plus an optional animated GIF. Returns the written paths
+    colors = _coloring(course_graph)
+    os.makedirs(directory, exist_ok=True)
+    G = to_networkx(course_graph)
+    pos = compute_layout(course_graph, G, k=1.5, iterations=50, cache=layout_cache)
+
+    # Agg canvas attached directly to the figure, so no pyplot backend is involved
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    nodes = _draw(ax, G, pos)
+    node_names = list(G.nodes())
+    steps = list(range(-1, max(colors.values(), default=-1) + 1))
+
+    def update(index):
+        ax.set_title(_step_title(index), fontweight='bold', pad=3)
+        nodes.set_facecolor(_step_colors(node_names, colors, index))
+        return nodes,
+
+    paths = []
+    for index in steps:
+        update(index)
+        for extension in formats:
+            path = os.path.join(directory, f"step_{index + 1:03d}.{extension}")
+            fig.savefig(path)
+            paths.append(path)
+
+    if gif:
+        path = os.path.join(directory, 'coloring.gif')
+        animation.FuncAnimation(fig, update, frames=steps, blit=False).save(path, writer=animation.PillowWriter(fps=fps))
+        paths.append(path)
+    return paths
@@ -0,0 +1,114 @@
+import collections
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import pstats
+import time
+import tracemalloc
+
+# Instrumentation for coloring and scheduling.
+# Pass a Stats object as stats= to CourseGraph.welsh_powell_algorithm or
+# TrimesterSchedule.schedule_courses to collect per-phase timers and counters, optionally with
+# cProfile and tracemalloc. Hot loops count in local variables and add the totals once per phase,
+# so the default NULL_STATS costs only a few no-op calls per run.
+
+
+class Stats:
+    enabled = True
+
+    def __init__(self, sink=None, profile=False, trace_memory=False):
+        self.timers = collections.defaultdict(float)  # Phase -> seconds
+        self.counters = collections.defaultdict(int)  # Counter -> total
+        self.memory_peaks = {}  # Run name -> peak traced bytes
+        self.sink = sink  # Called as sink(run name, stats dict) after every run
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] += time.perf_counter() - start
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    @contextlib.contextmanager
+    def run(self, name):
+        # Wrap a whole coloring or scheduling call: time it, optionally profile it and trace its
+        # memory, then hand the results to the sink
+        started_tracing = False
+        if self.trace_memory:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            with self.timer(name):
+                yield
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            if self.trace_memory:
+                self.memory_peaks[name] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            if self.sink:
+                self.sink(name, self.as_dict())
+
+    def as_dict(self):
+        return {
+            'timers': {phase: round(seconds, 6) for phase, seconds in self.timers.items()},
+            'counters': dict(self.counters),
+            'memory_peaks': dict(self.memory_peaks),
+        }
+
+    def profile_report(self, sort='cumulative', limit=20):
+        # Text report of the cProfile data (empty if profiling is off)
+        if not self.profiler:
+            return ''
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+class _NullStats:
+    # Stand-in used when instrumentation is off: every call is a no-op
+    enabled = False
+
+    def timer(self, phase):
+        return _NULL_CONTEXT
+
+    def count(self, counter, n=1):
+        pass
+
+    def run(self, name):
+        return _NULL_CONTEXT
+
+
+_NULL_CONTEXT = contextlib.nullcontext()
+NULL_STATS = _NullStats()
+
+
+# ---------------------------- SINKS ----------------------------
+def log_sink(logger=None, level=logging.INFO):
+    # Log every run as one JSON line
+    logger = logger or logging.getLogger('courseScheduling.stats')
+
+    def sink(name, stats):
+        logger.log(level, "%s %s", name, json.dumps(stats, sort_keys=True))
+    return sink
+
+
+def json_lines_sink(path):
+    # Append every run as a JSON line to a file
+    def sink(name, stats):
+        with open(path, 'a') as file:
+            file.write(json.dumps({'run': name, **stats}, sort_keys=True) + '\n')
+    return sink
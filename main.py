@@ -35,10 +35,14 @@ Final goal: get a optimun shcedule for the all trismester
 """
 
 import datetime
+import logging
 from courseGraph import CourseGraph
 from trimesterSchedule import TrimesterSchedule
 from trimesterSchedule import allowed_time_slots
 
+# Show the chromatic number and scheduling warnings
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
 # Add the courses
 courses = [
     "Programming With Python",
@@ -86,9 +90,9 @@ course_graph.add_conflict("Data Analytics for Decision Making", "Data Structures
 
 course_graph.add_conflict("SQL Lab", "Data Structures and Algorithms") #Afternoon vs afternoon
 
-course_graph.add_conflict("Cloud Foundations", "Discrete Maths for Computing") # Same professor and same time
+course_graph.add_conflict("Cloud Foundations", "Discrete Maths for Computing", hard=True) # Same professor and same time
 
-course_graph.add_conflict("Data Structures and Algorithms", "SQL Lab") # Same professor & afternoon vs afternoon
+course_graph.add_conflict("Data Structures and Algorithms", "SQL Lab", hard=True) # Same professor & afternoon vs afternoon
 
 # Run the graph coloring algorithm to get the schedule
 course_colors = course_graph.welsh_powell_algorithm()
@@ -106,6 +110,10 @@ full_schedule = trimester_schedule.schedule_courses(course_colors, course_sessio
 for date, day_schedule in full_schedule.items():
     print(date.strftime('%Y-%m-%d'), day_schedule)
 
+# Export the schedule (.ics, .csv, .jsonl or the compact .bin)
+# from scheduleExport import export_schedule
+# export_schedule(full_schedule, 'schedule.ics')
+
 # Visualize the graph
 course_graph.visualize_graph()
 # course_graph.visualize_graph_without_colors()
@@ -0,0 +1,103 @@
+import collections
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+# Cache for colorings and schedules.
+# Entries are keyed by a fingerprint: a SHA-256 of a canonical form of the inputs (sets sorted,
+# dates in ISO format, dict keys sorted), so equal inputs give the same key in every process.
+# Recent entries stay in an in-memory LRU; with a directory they are also pickled to disk,
+# where the least recently used files are evicted once the store grows past max_disk_bytes.
+
+
+def _canonical(value):
+    # Turn the inputs into plain JSON values with a stable order
+    if isinstance(value, dict):
+        return sorted(([_canonical(key), _canonical(item)] for key, item in value.items()), key=json.dumps)
+    if isinstance(value, (set, frozenset, type({}.keys()))):
+        return sorted((_canonical(item) for item in value), key=json.dumps)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
+
+
+def fingerprint(*parts):
+    # Canonical hash of any mix of dicts, sets, lists, dates, strings and numbers
+    data = json.dumps(_canonical(parts), separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class ScheduleCache:
+    def __init__(self, directory=None, max_entries=128, max_disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = collections.OrderedDict()  # Key -> value, least recently used first
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key, default=None):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as file:
+                    value = pickle.load(file)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                return default
+            os.utime(self._path(key))  # Mark as recently used for the disk eviction
+            self._remember(key, value)
+            return value
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if not self.directory:
+            return
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self._path(key))
+        self._evict_disk()
+
+    def clear(self):
+        self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pickle'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Remove the least recently used files until the store fits in max_disk_bytes
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -0,0 +1,229 @@
+import csv
+import datetime
+import hashlib
+import json
+import os
+import struct
+import zoneinfo
+import numpy as np
+from trimesterSchedule import slot_labels, time_slots
+
+# Export of schedules, one session at a time.
+# Every writer takes a schedule as returned by schedule_courses ({date: [(course, time_slot)]}),
+# by CampusSchedule.schedule_campus ({date: [(course, time_slot, room)]}) or any iterable of
+# (date, day_schedule) pairs, so a timetable can be streamed day by day from a generator.
+#   write_ics          -> iCalendar, one VEVENT per session
+#   write_csv          -> date,start,end,course,room
+#   write_json_lines   -> one JSON object per session
+#   write_columnar     -> compact binary: int32 (day, slot, course, room) rows plus a name table,
+#                         read back with read_columnar as memory-mapped columns
+
+SESSION_LENGTH = datetime.timedelta(hours=1, minutes=20)
+
+# Start time of every slot label, parsed only once
+slot_times = {label: datetime.datetime.strptime(label, '%I:%M %p').time() for label in slot_labels}
+
+
+def iter_sessions(schedule):
+    # Yield (date, course, time_slot, room) for every session in date order; room is None for
+    # single-classroom schedules
+    days = sorted(schedule.items()) if isinstance(schedule, dict) else schedule
+    for date, day_schedule in days:
+        for session in day_schedule:
+            course, time_slot = session[0], session[1]
+            yield date, course, time_slot, session[2] if len(session) > 2 else None
+
+
+def _session_times(date, time_slot):
+    start = datetime.datetime.combine(date, slot_times[time_slot])
+    return start, start + SESSION_LENGTH
+
+
+# ---------------------------- TEXT FORMATS ----------------------------
+def _ics_text(value):
+    # Escape a TEXT value (RFC 5545, 3.3.11)
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_line(line):
+    # Fold content lines longer than 75 octets (RFC 5545, 3.1)
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        cut = 75 if not parts else 74
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:  # Don't split a UTF-8 character
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _ics_time(moment, zone):
+    # Local ("floating") time, or UTC with a Z suffix when the zone of the slot times is known, so
+    # no VTIMEZONE component is needed (RFC 5545, 3.3.5)
+    if zone is None:
+        return f"{moment:%Y%m%dT%H%M%S}"
+    return f"{moment.replace(tzinfo=zone).astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def write_ics(schedule, path, calendar_name='Course Schedule', timezone=None):
+    # Write an iCalendar file with one event per session. Times are local ("floating") unless the
+    # timezone id of the campus (e.g. 'Europe/Madrid') is given, then they are written in UTC.
+    # Returns the number of events
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    zone = zoneinfo.ZoneInfo(timezone) if timezone else None
+    count = 0
+    with open(path, 'w', newline='') as file:
+        for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//courseScheduling//Schedule Export//EN',
+                     f"X-WR-CALNAME:{_ics_text(calendar_name)}"):
+            file.write(_ics_line(line))
+
+        for date, course, time_slot, room in iter_sessions(schedule):
+            start, end = _session_times(date, time_slot)
+            uid = hashlib.sha256(f"{date.isoformat()}|{time_slot}|{course}|{room}".encode()).hexdigest()[:32]
+            file.write(_ics_line('BEGIN:VEVENT'))
+            file.write(_ics_line(f"UID:{uid}@courseScheduling"))
+            file.write(_ics_line(f"DTSTAMP:{stamp}"))
+            file.write(_ics_line(f"DTSTART:{_ics_time(start, zone)}"))
+            file.write(_ics_line(f"DTEND:{_ics_time(end, zone)}"))
+            file.write(_ics_line(f"SUMMARY:{_ics_text(course)}"))
+            if room is not None:
+                file.write(_ics_line(f"LOCATION:{_ics_text(room)}"))
+            file.write(_ics_line('END:VEVENT'))
+            count += 1
+
+        file.write(_ics_line('END:VCALENDAR'))
+    return count
+
+
+def write_csv(schedule, path):
+    # One row per session: date,start,end,course,room. Returns the number of rows
+    count = 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['date', 'start', 'end', 'course', 'room'])
+        for date, course, time_slot, room in iter_sessions(schedule):
+            start, end = _session_times(date, time_slot)
+            writer.writerow([date.isoformat(), f"{start:%H:%M}", f"{end:%H:%M}", course, '' if room is None else room])
+            count += 1
+    return count
+
+
+def write_json_lines(schedule, path):
+    # One JSON object per session. Returns the number of lines
+    count = 0
+    with open(path, 'w') as file:
+        for date, course, time_slot, room in iter_sessions(schedule):
+            start, end = _session_times(date, time_slot)
+            session = {'date': date.isoformat(), 'start': f"{start:%H:%M}", 'end': f"{end:%H:%M}", 'course': course}
+            if room is not None:
+                session['room'] = room
+            file.write(json.dumps(session) + '\n')
+            count += 1
+    return count
+
+
+# ---------------------------- COLUMNAR BINARY ----------------------------
+# Layout: a 24-byte header (magic, version, number of rows, offset of the name table), the rows
+# as int32 (day, slot, course, room) with day in days since 1970-01-01 and room -1 when there is
+# none, then the name table as JSON. The table goes last so rows can be written while the names
+# are still being discovered.
+COLUMNAR_MAGIC = b'CSCH'
+COLUMNAR_VERSION = 1
+_HEADER = struct.Struct('<4sIQQ')
+COLUMNS = ('day', 'slot', 'course', 'room')
+
+
+def write_columnar(schedule, path, chunk_size=65536):
+    # Write the schedule in the columnar binary form, buffering at most chunk_size rows.
+    # Returns the number of rows
+    course_ids, room_ids = {}, {}
+    epoch = datetime.date(1970, 1, 1)
+    buffer = np.empty((chunk_size, len(COLUMNS)), dtype='<i4')
+    n_rows = filled = 0
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 0, 0))
+        for date, course, time_slot, room in iter_sessions(schedule):
+            buffer[filled] = ((date - epoch).days, slot_labels[time_slot], course_ids.setdefault(course, len(course_ids)),
+                              -1 if room is None else room_ids.setdefault(room, len(room_ids)))
+            filled += 1
+            if filled == chunk_size:
+                file.write(buffer.tobytes())
+                n_rows += filled
+                filled = 0
+        file.write(buffer[:filled].tobytes())
+        n_rows += filled
+
+        table_offset = file.tell()
+        file.write(json.dumps({'courses': list(course_ids), 'rooms': list(room_ids),
+                               'slots': {str(slot): label for slot, label in time_slots.items()}}).encode())
+        file.seek(0)
+        file.write(_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, n_rows, table_offset))
+    return n_rows
+
+
+class ColumnarSchedule:
+    # A columnar schedule file mapped into memory: day, slot, course and room are int32 column
+    # views over the file, and the name tables turn ids back into labels
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            magic, version, n_rows, table_offset = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+                raise ValueError(f"{path} is not a columnar schedule file (version {COLUMNAR_VERSION}).")
+            file.seek(table_offset)
+            table = json.loads(file.read())
+
+        self.course_names = table['courses']
+        self.room_names = table['rooms']
+        self.slot_names = {int(slot): label for slot, label in table['slots'].items()}
+        if n_rows:
+            self.rows = np.memmap(path, dtype='<i4', mode='r', offset=_HEADER.size, shape=(n_rows, len(COLUMNS)))
+        else:
+            self.rows = np.empty((0, len(COLUMNS)), dtype='<i4')
+        for i, column in enumerate(COLUMNS):
+            setattr(self, column, self.rows[:, i])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def dates(self):
+        # Day column as numpy dates
+        return self.day.astype('datetime64[D]')
+
+    def __iter__(self):
+        # Yield (date, course, time_slot, room) like iter_sessions
+        epoch = datetime.date(1970, 1, 1)
+        for day, slot, course, room in self.rows.tolist():
+            yield (epoch + datetime.timedelta(days=day), self.course_names[course], self.slot_names[slot],
+                   None if room < 0 else self.room_names[room])
+
+    def to_schedule(self):
+        # Back to {date: [(course, time_slot)]}, or (course, time_slot, room) when rooms were stored
+        schedule = {}
+        for date, course, time_slot, room in self:
+            schedule.setdefault(date, []).append((course, time_slot) if room is None else (course, time_slot, room))
+        return schedule
+
+
+def read_columnar(path):
+    return ColumnarSchedule(path)
+
+
+# Writers by file extension
+EXPORTERS = {
+    '.ics': write_ics,
+    '.csv': write_csv,
+    '.jsonl': write_json_lines,
+    '.bin': write_columnar,
+}
+
+
+def export_schedule(schedule, path):
+    # Write the schedule in the format given by the file extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Unknown export format '{extension}'. Choose one of {', '.join(EXPORTERS)}.")
+    return EXPORTERS[extension](schedule, path)
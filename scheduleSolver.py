@@ -0,0 +1,189 @@
+import itertools
+import math
+import time
+from instrumentation import NULL_STATS
+
+# Constraint solver for the trimester schedule.
+# Model: every date uses a single part of the day (morning or afternoon), takes at most
+# max_courses_per_day courses in distinct slots, never holds two courses of the same color,
+# and every course gets exactly its number of sessions within its allowed slots.
+# Dates are filled in order by depth-first search. After each date the remaining demand is
+# propagated against the remaining dates (per course, per color and per part of the day),
+# courses that can no longer wait are forced into the current date, and failed states are
+# remembered so they are never explored twice.
+
+
+class UnsatisfiableScheduleError(ValueError):
+    # Raised when no complete schedule exists; reason says which constraint can't be met
+    def __init__(self, reason):
+        super().__init__(f"No complete schedule exists: {reason}")
+        self.reason = reason
+
+
+def _assign_slots(combo, slots, allowed):
+    # Give each course of the combo a different slot it is allowed in (None if impossible)
+    for assignment in itertools.permutations(slots, len(combo)):
+        if all(slot in allowed[course] for course, slot in zip(combo, assignment)):
+            return assignment
+    return None
+
+
+def solve_schedule(dates, course_colors, course_sessions, allowed_time_slots, day_parts, time_slots,
+                   max_courses_per_day, time_budget=10.0, stats=NULL_STATS):
+    deadline = time.monotonic() + time_budget
+
+    courses = [course for course in course_colors if course_sessions[course] > 0]
+    colors = [course_colors[course] for course in courses]
+    allowed = [set(allowed_time_slots[course]) for course in courses]
+    demand = [course_sessions[course] for course in courses]
+    n_days = len(dates)
+
+    # Capacity of each part of the day and the parts each course can use
+    parts = [sorted(slots) for slots in day_parts]
+    capacity = [min(max_courses_per_day, len(slots)) for slots in parts]
+    course_parts = [[p for p, slots in enumerate(parts) if allowed[c].intersection(slots)] for c in range(len(courses))]
+
+    for c, course in enumerate(courses):
+        if not course_parts[c]:
+            raise UnsatisfiableScheduleError(f"{course} has no allowed time slot")
+
+    # Courses restricted to a single part of the day, grouped by every set of slots of that part
+    # that holds all their allowed slots, with the number of them a date can take
+    part_groups = []
+    for p, slots in enumerate(parts):
+        only_here = [c for c in range(len(courses)) if course_parts[c] == [p]]
+        subsets = [subset for size in range(1, len(slots) + 1) for subset in itertools.combinations(slots, size)]
+        if len(slots) > 6:
+            subsets = [(slot,) for slot in slots] + [tuple(slots)]
+        part_groups.append([
+            ([c for c in only_here if allowed[c].intersection(slots) <= set(subset)], min(len(subset), capacity[p]))
+            for subset in subsets
+        ])
+
+    def color_totals(demand):
+        totals = {}
+        for c, needed in enumerate(demand):
+            if needed:
+                totals[colors[c]] = totals.get(colors[c], 0) + needed
+        return totals
+
+    def check(demand, remaining):
+        # Propagate the remaining demand against the remaining dates; return why it fails, if it does
+        for c, needed in enumerate(demand):
+            if needed > remaining:
+                return f"{courses[c]} needs {needed} more sessions but only {remaining} dates are left"
+        for color, needed in color_totals(demand).items():
+            if needed > remaining:
+                return f"courses with color {color} need {needed} sessions but only {remaining} dates are left"
+
+        # Courses restricted to a single part of the day need dates of their own
+        needed_dates = 0
+        for groups in part_groups:
+            part_dates = 0
+            for group, per_date in groups:
+                totals = {}
+                for c in group:
+                    if demand[c]:
+                        totals[colors[c]] = totals.get(colors[c], 0) + demand[c]
+                if totals:
+                    part_dates = max(part_dates, max(totals.values()), math.ceil(sum(totals.values()) / per_date))
+            needed_dates += part_dates
+        if needed_dates > remaining:
+            return f"courses restricted to one part of the day need {needed_dates} dates but only {remaining} are left"
+
+        if sum(demand) > remaining * max(capacity, default=0):
+            return f"{sum(demand)} sessions are left but only {remaining} dates with {max(capacity)} courses each"
+        return None
+
+    def day_options(demand, remaining):
+        # Yield (part, [(course, slot)]) choices for the current date, most urgent first
+        active = [c for c in range(len(courses)) if demand[c]]
+        totals = color_totals(demand)
+        forced = [c for c in active if demand[c] == remaining]
+        forced_colors = {color for color, needed in totals.items() if needed == remaining}
+
+        def urgency(c):
+            return remaining - demand[c], remaining - totals[colors[c]], c
+
+        def part_pressure(p):
+            return min((urgency(c) for c in active if course_parts[c] == [p]), default=(remaining,))
+
+        placed_any = False
+        for p in sorted(range(len(parts)), key=part_pressure):
+            if any(p not in course_parts[c] for c in forced):
+                continue
+            eligible = sorted((c for c in active if p in course_parts[c]), key=urgency)
+
+            # Filling a date dominates leaving it emptier, so smaller combos are only tried
+            # when no course can be added to them
+            for size in range(min(capacity[p], len({colors[c] for c in eligible})), 0, -1):
+                for combo in itertools.combinations(eligible, size):
+                    combo_colors = {colors[c] for c in combo}
+                    if len(combo_colors) < size or not forced_colors <= combo_colors:
+                        continue
+                    if any(c not in combo for c in forced):
+                        continue
+                    assignment = _assign_slots(combo, parts[p], allowed)
+                    if assignment is None:
+                        continue
+                    if size < capacity[p] and any(
+                        colors[c] not in combo_colors and _assign_slots(combo + (c,), parts[p], allowed)
+                        for c in eligible if c not in combo
+                    ):
+                        continue
+                    placed_any = True
+                    yield p, list(zip(combo, assignment))
+
+        # Nothing fits in any part: the date stays empty
+        if not placed_any and not forced and not forced_colors:
+            yield None, []
+
+    reason = check(demand, n_days)
+    if reason:
+        raise UnsatisfiableScheduleError(reason)
+
+    failed = set()  # (remaining dates, demand) states known to have no solution
+    chosen = []
+    stack = [(tuple(demand), day_options(demand, n_days))]
+    placement_attempts = pruned = backtracks = 0
+
+    try:
+        while sum(demand):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No schedule found within the time budget of {time_budget} seconds")
+
+            state, options = stack[-1]
+            option = next(options, None)
+            if option is None:
+                # Every choice for this date failed: remember the state and backtrack
+                failed.add((n_days - len(chosen), state))
+                backtracks += 1
+                stack.pop()
+                if not stack:
+                    raise UnsatisfiableScheduleError("no assignment of courses to dates satisfies all constraints")
+                for c, _ in chosen.pop()[1]:
+                    demand[c] += 1
+                continue
+
+            placement_attempts += 1
+            for c, _ in option[1]:
+                demand[c] -= 1
+            remaining = n_days - len(chosen) - 1
+            if sum(demand) and ((remaining, tuple(demand)) in failed or check(demand, remaining)):
+                pruned += 1
+                for c, _ in option[1]:
+                    demand[c] += 1
+                continue
+
+            chosen.append(option)
+            stack.append((tuple(demand), day_options(demand, remaining)))
+    finally:
+        stats.count('placement_attempts', placement_attempts)
+        stats.count('pruned_placements', pruned)
+        stats.count('backtracks', backtracks)
+
+    # Build the schedule: every date with its (course, time slot) pairs
+    schedule = {date: [] for date in dates}
+    for date, (_, placements) in zip(dates, chosen):
+        schedule[date] = [(courses[c], time_slots[slot]) for c, slot in placements]
+    return schedule
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from scheduleCache import ScheduleCache, fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Scheduling service: an asyncio HTTP server (TCP or Unix socket) in front of the coloring and
+# scheduling code.
+#   POST /color      {"courses": [...], "conflicts": [[a, b], [a, b, weight], [a, b, weight, hard]],
+#                     "engine": "welsh_powell"}                      -> {"colors": {course: color}}
+#   POST /schedule   the /color payload plus "course_sessions", "allowed_time_slots" ({course: [slot ids]}),
+#                    "start_date", "end_date" and optionally "max_courses_per_day", "holidays",
+#                    "schedule_engine", "seed" and "time_budget"     -> {"colors", "schedule", "unplaced"}
+#   GET  /health     counters of the service
+# Every payload may carry "timeout" (seconds, capped by the server). Work runs in process pools:
+# catalogs bigger than large_threshold (courses + conflicts) go to a separate pool so they can't
+# starve small requests. Identical requests in flight share one job, at most max_pending jobs are
+# admitted at once (503 beyond that) and requests over their timeout get 504.
+# test_schedulingService.py runs the service on localhost: python -m unittest test_schedulingService
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# ---------------------------- JOBS (run in the worker processes) ----------------------------
+_worker_cache = ScheduleCache(max_entries=32)  # One per worker process, reused across requests
+
+
+def _build_graph(payload):
+    from courseGraph import CourseGraph
+
+    course_graph = CourseGraph()
+    for course in payload['courses']:
+        course_graph.add_course(course)
+    course_graph.add_conflicts(tuple(conflict) for conflict in payload.get('conflicts', []))
+    return course_graph
+
+
+def _color_job(payload):
+    course_graph = _build_graph(payload)
+    colors = course_graph.welsh_powell_algorithm(payload.get('engine', 'welsh_powell'), cache=_worker_cache)
+    return HTTPStatus.OK, {'colors': colors}
+
+
+def _schedule_job(payload):
+    from scheduleSolver import UnsatisfiableScheduleError
+    from trimesterSchedule import TrimesterSchedule
+
+    course_graph = _build_graph(payload)
+    colors = course_graph.welsh_powell_algorithm(payload.get('engine', 'welsh_powell'), cache=_worker_cache)
+    holidays = payload.get('holidays')
+    trimester = TrimesterSchedule(datetime.date.fromisoformat(payload['start_date']),
+                                  datetime.date.fromisoformat(payload['end_date']),
+                                  payload.get('max_courses_per_day', 2),
+                                  None if holidays is None else [datetime.date.fromisoformat(day) for day in holidays])
+    allowed_time_slots = {course: set(slots) for course, slots in payload['allowed_time_slots'].items()}
+    try:
+        schedule = trimester.schedule_courses(colors, payload['course_sessions'], allowed_time_slots,
+                                              payload.get('schedule_engine', 'greedy'),
+                                              payload.get('time_budget', 10.0), payload.get('seed'), _worker_cache)
+    except UnsatisfiableScheduleError as error:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': error.reason}
+    except TimeoutError as error:
+        return HTTPStatus.GATEWAY_TIMEOUT, {'error': str(error)}
+
+    sessions = [{'date': date.isoformat(), 'course': course, 'time_slot': time_slot}
+                for date in sorted(schedule) for course, time_slot in schedule[date]]
+    return HTTPStatus.OK, {'colors': colors, 'schedule': sessions, 'unplaced': trimester.unplaced}
+
+
+JOBS = {
+    '/color': _color_job,
+    '/schedule': _schedule_job,
+}
+
+
+def _job_size(payload):
+    return len(payload.get('courses', [])) + len(payload.get('conflicts', []))
+
+
+# ---------------------------- SERVICE ----------------------------
+class SchedulingService:
+    def __init__(self, workers=None, large_workers=1, large_threshold=20000, max_pending=64, timeout=30.0):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.large_workers = large_workers
+        self.large_threshold = large_threshold
+        self.max_pending = max_pending
+        self.timeout = timeout  # Longest a request may wait for its result
+        self._executor = None
+        self._large_executor = None
+        self._in_flight = {}  # Request fingerprint -> asyncio future of the shared job
+        self._server = None
+        self.counters = {'requests': 0, 'coalesced': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0}
+
+    def _executors(self):
+        # Workers are started from a clean process (forkserver, or spawn where there is none): forked
+        # from the server they would inherit client sockets and keep those connections open
+        if self._executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._large_executor = ProcessPoolExecutor(max_workers=self.large_workers, mp_context=context)
+        return self._executor, self._large_executor
+
+    def _submit(self, path, payload):
+        # Run the job in the pool for its size; a pool left broken by a dead worker (out of memory,
+        # killed) is replaced once
+        for attempt in range(2):
+            executor, large_executor = self._executors()
+            executor = large_executor if _job_size(payload) > self.large_threshold else executor
+            try:
+                return executor.submit(JOBS[path], payload)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                logger.warning("Worker pool broken, starting a new one")
+                for executor in (self._executor, self._large_executor):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._large_executor = None
+
+    async def handle(self, method, path, body):
+        # Answer one request as (HTTP status, JSON-ready payload); independent of the transport
+        self.counters['requests'] += 1
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {**self.counters, 'in_flight': len(self._in_flight), 'max_pending': self.max_pending}
+        if path not in JOBS:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown path '{path}'"}
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': f"{path} only accepts POST"}
+
+        try:
+            payload = json.loads(body or b'{}')
+            if not isinstance(payload, dict) or 'courses' not in payload:
+                raise ValueError("the payload must be a JSON object with 'courses'")
+            if not isinstance(payload['courses'], list) or not all(isinstance(course, str)
+                                                                   for course in payload['courses']):
+                raise ValueError("'courses' must be a list of course names")
+            if not isinstance(payload.get('conflicts', []), list):
+                raise ValueError("'conflicts' must be a list of [course1, course2, ...] entries")
+            try:
+                timeout = float(payload.pop('timeout', self.timeout))
+            except (TypeError, ValueError):
+                raise ValueError("'timeout' must be a number of seconds") from None
+            if not timeout > 0:  # Also rejects NaN
+                raise ValueError("'timeout' must be a positive number of seconds")
+            timeout = min(timeout, self.timeout)
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {'error': f"Invalid request: {error}"}
+
+        # Identical requests in flight share one job
+        key = fingerprint(path, payload)
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+        else:
+            if len(self._in_flight) >= self.max_pending:
+                self.counters['rejected'] += 1
+                return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Too many pending requests, retry later"}
+            future = asyncio.wrap_future(self._submit(path, payload))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        try:
+            # shield: a timeout ends this request only, the shared job keeps running for the others
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            return HTTPStatus.GATEWAY_TIMEOUT, {'error': f"No result within {timeout:g} seconds"}
+        except (KeyError, TypeError, ValueError) as error:
+            self.counters['errors'] += 1
+            return HTTPStatus.BAD_REQUEST, {'error': f"Invalid request: {error!r}"}
+        except Exception as error:
+            self.counters['errors'] += 1
+            logger.exception("Request to %s failed", path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': repr(error)}
+
+    async def _serve_connection(self, reader, writer):
+        # Minimal HTTP/1.1: one request per connection
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            length = headers.get('content-length', '0')
+            if len(request_line) != 3:
+                status, response = HTTPStatus.BAD_REQUEST, {'error': "Malformed request line"}
+            elif not length.isdecimal():
+                status, response = HTTPStatus.BAD_REQUEST, {'error': f"Invalid Content-Length '{length}'"}
+            elif int(length) > MAX_BODY_BYTES:
+                status, response = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "Payload too large"}
+            else:
+                body = await reader.readexactly(int(length))
+                status, response = await self.handle(request_line[0], request_line[1].split('?', 1)[0], body)
+
+            data = json.dumps(response).encode()
+            writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080, path=None):
+        # Listen on a Unix socket when path is given, else on host:port
+        if path:
+            self._server = await asyncio.start_unix_server(self._serve_connection, path)
+        else:
+            self._server = await asyncio.start_server(self._serve_connection, host, port)
+        self._executors()
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for executor in (self._executor, self._large_executor):
+            if executor is not None:
+                await asyncio.to_thread(executor.shutdown, cancel_futures=True)
+        self._executor = self._large_executor = None
+
+
+async def serve(args):
+    service = SchedulingService(args.workers, args.large_workers, args.large_threshold, args.max_pending,
+                                args.timeout)
+    server = await service.start(args.host, args.port, args.unix)
+    logger.info("Scheduling service listening on %s", args.unix or f"http://{args.host}:{args.port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Course coloring and scheduling service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix', help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument('--workers', type=int, help="Processes for small requests (default: CPUs - 1)")
+    parser.add_argument('--large-workers', type=int, default=1, help="Processes for large catalogs")
+    parser.add_argument('--large-threshold', type=int, default=20000, help="Courses + conflicts of a large catalog")
+    parser.add_argument('--max-pending', type=int, default=64, help="Jobs admitted at once before answering 503")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Longest wait per request, in seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import unittest
+from schedulingService import SchedulingService
+
+# Localhost tests of the scheduling service: python -m unittest test_schedulingService
+# Every test starts its own service on a free port, so the worker processes are still starting when
+# the first requests arrive and the concurrent requests below are all in flight together.
+
+CATALOG = {
+    'courses': ['Python', 'Cloud', 'SQL Lab', 'Cybersecurity'],
+    'conflicts': [['Python', 'Cloud'], ['Cloud', 'SQL Lab'], ['SQL Lab', 'Cybersecurity', 2, True]],
+}
+
+
+class SchedulingServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def start_service(self, **options):
+        self.service = SchedulingService(workers=1, **options)
+        server = await self.service.start(port=0)
+        self.port = server.sockets[0].getsockname()[1]
+        self.addAsyncCleanup(self.service.close)
+
+    async def request(self, method, path, payload=None, body=None, content_length=None):
+        # Send one HTTP request and return (status, JSON response)
+        if body is None:
+            body = b'' if payload is None else json.dumps(payload).encode()
+        content_length = len(body) if content_length is None else content_length
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {content_length}\r\n\r\n".encode()
+                     + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        await writer.wait_closed()
+
+        head, _, data = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(data)
+
+    async def test_color(self):
+        await self.start_service()
+        status, response = await self.request('POST', '/color', CATALOG)
+        self.assertEqual(status, 200)
+        colors = response['colors']
+        self.assertEqual(set(colors), set(CATALOG['courses']))
+        for course1, course2, *_ in CATALOG['conflicts']:
+            self.assertNotEqual(colors[course1], colors[course2])
+
+    async def test_identical_requests_share_one_job(self):
+        await self.start_service()
+        responses = await asyncio.gather(*(self.request('POST', '/color', CATALOG) for _ in range(3)))
+        self.assertEqual([status for status, _ in responses], [200] * 3)
+        self.assertEqual(len({json.dumps(response, sort_keys=True) for _, response in responses}), 1)
+        self.assertEqual(self.service.counters['coalesced'], 2)
+
+    async def test_backpressure(self):
+        await self.start_service(max_pending=1)
+        other = {**CATALOG, 'engine': 'dsatur'}
+        statuses = sorted(status for status, _ in await asyncio.gather(self.request('POST', '/color', CATALOG),
+                                                                       self.request('POST', '/color', other)))
+        self.assertEqual(statuses, [200, 503])
+        self.assertEqual(self.service.counters['rejected'], 1)
+
+    async def test_timeout(self):
+        await self.start_service()
+        status, response = await self.request('POST', '/color', {**CATALOG, 'timeout': 0.001})
+        self.assertEqual(status, 504)
+        self.assertIn('error', response)
+        self.assertEqual(self.service.counters['timeouts'], 1)
+
+        # The job keeps running and the same catalog is answered afterwards
+        status, _ = await self.request('POST', '/color', CATALOG)
+        self.assertEqual(status, 200)
+
+    async def test_malformed_requests(self):
+        await self.start_service()
+        payloads = [
+            b'{"courses": ',
+            b'[1, 2]',
+            b'{"conflicts": []}',
+            json.dumps({'courses': 'abc'}).encode(),
+            json.dumps({'courses': ['a', 1]}).encode(),
+            json.dumps({'courses': ['a'], 'conflicts': 'a-b'}).encode(),
+        ]
+        payloads += [json.dumps({**CATALOG, 'timeout': timeout}).encode()
+                     for timeout in (None, [1], {'seconds': 1}, 'soon', 0, -1)]
+        payloads.append(json.dumps(CATALOG).replace('}', ', "timeout": NaN}', 1).encode())
+        for body in payloads:
+            with self.subTest(body=body):
+                status, response = await self.request('POST', '/color', body=body)
+                self.assertEqual(status, 400)
+                self.assertTrue(response['error'].startswith('Invalid request'))
+
+        for content_length in ('abc', '-1'):
+            with self.subTest(content_length=content_length):
+                status, _ = await self.request('POST', '/color', CATALOG, content_length=content_length)
+                self.assertEqual(status, 400)
+
+        self.assertEqual((await self.request('POST', '/unknown', CATALOG))[0], 404)
+        self.assertEqual((await self.request('GET', '/color'))[0], 405)
+
+        # The service still answers after all of them
+        status, response = await self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(response['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
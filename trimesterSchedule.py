@@ -1,6 +1,17 @@
+import bisect
+import collections
 import datetime
 import itertools
+import os
 import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import logging
+import numpy as np
+from instrumentation import NULL_STATS
+from scheduleCache import fingerprint
+from scheduleSolver import solve_schedule
+
+logger = logging.getLogger(__name__)
 
 # Define the time slots for morning and afternoon classes
 morning_slots = {
@@ -16,6 +27,11 @@ afternoon_slots = {
 # Combine morning and afternoon slots into one dictionary
 time_slots = {**morning_slots, **afternoon_slots}
 
+# Slot ids in chronological order and the rank of each slot label, parsed only once
+slot_order = sorted(time_slots, key=lambda slot: datetime.datetime.strptime(time_slots[slot], '%I:%M %p'))
+slot_rank = {time_slots[slot]: rank for rank, slot in enumerate(slot_order)}
+slot_labels = {label: slot for slot, label in time_slots.items()}  # Slot label -> slot id
+
 # Define a mapping from courses to their allowed time slots based on their time-of-day restrictions
 allowed_time_slots = {
     'Programming With Python': morning_slots.keys() | afternoon_slots.keys(),  # All day
@@ -37,111 +53,451 @@ spanish_holidays = [
     datetime.date(2023,12,6),     # Constitution Day
     datetime.date(2023, 12, 8),   # Immaculate Conception
 ]
+
+
+def load_holidays(path):
+    # Read a holiday calendar file: one ISO date (YYYY-MM-DD) per line, '#' starts a comment
+    holidays = []
+    with open(path) as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                holidays.append(datetime.date.fromisoformat(line))
+    return holidays
+
+
+# Result of one seeded scheduling attempt; lower scores are better
+ScheduleTrial = collections.namedtuple('ScheduleTrial', ['schedule', 'seed', 'score'])
+
+
+def score_schedule(schedule, course_sessions):
+    # Score a schedule as (unplaced sessions, session spread, morning/afternoon balance):
+    # spread is the standard deviation of the gaps between the sessions of each course (in
+    # working days) summed over courses, balance is the difference between morning and afternoon days
+    positions = {date: i for i, date in enumerate(sorted(schedule))}
+    course_days = collections.defaultdict(list)
+    morning_days = afternoon_days = 0
+
+    for date, day_schedule in schedule.items():
+        for course, _ in day_schedule:
+            course_days[course].append(positions[date])
+        if day_schedule:
+            if slot_labels[day_schedule[0][1]] in morning_slots:
+                morning_days += 1
+            else:
+                afternoon_days += 1
+
+    unplaced = sum(max(sessions - len(course_days[course]), 0) for course, sessions in course_sessions.items())
+    spread = 0.0
+    for days in course_days.values():
+        if len(days) > 2:
+            spread += float(np.std(np.diff(sorted(days))))
+    return unplaced, round(spread, 6), abs(morning_days - afternoon_days)
+
+
+def _run_trial(schedule_args, seed, course_colors, course_sessions, allowed_time_slots):
+    # Worker for TrimesterSchedule.best_of: one seeded greedy attempt, scored
+    schedule = TrimesterSchedule(*schedule_args).schedule_courses(course_colors, course_sessions,
+                                                                 allowed_time_slots, seed=seed)
+    return ScheduleTrial(schedule, seed, score_schedule(schedule, course_sessions))
+
+
 class TrimesterSchedule:
-    def __init__(self, start_date, end_date, max_courses_per_day=2):
+    def __init__(self, start_date, end_date, max_courses_per_day=2, holidays=None, weekmask='Mon Tue Wed Thu Fri'):
         self.start_date = start_date
         self.end_date = end_date
         self.max_courses_per_day = max_courses_per_day
+        self.weekmask = weekmask
+
+        # Holidays can be a list of dates or the path of a calendar file (one per campus)
+        if holidays is None:
+            holidays = spanish_holidays
+        elif isinstance(holidays, (str, os.PathLike)):
+            holidays = load_holidays(holidays)
+        self.holidays = sorted(set(holidays))
+        self.calendar = np.busdaycalendar(weekmask=weekmask, holidays=self.holidays)
+
         self.dates = self._generate_dates()
+        self.date_positions = {date: i for i, date in enumerate(self.dates)}  # Date -> working day index
 
     def _generate_dates(self):
-        # Generate a list of dates for the trimester, excluding weekends and holidays
-        delta = self.end_date - self.start_date
-        return [
-            self.start_date + datetime.timedelta(days=i)
-            for i in range(delta.days + 1)
-            if (self.start_date + datetime.timedelta(days=i)).weekday() < 5 and  # Check if it's a weekday
-            (self.start_date + datetime.timedelta(days=i)) not in spanish_holidays  # Check if it's not a holiday
-        ]
-    def schedule_courses(self, course_colors, course_sessions, allowed_time_slots):
+        # Generate the working days of the trimester from the weekmask and holidays of the calendar
+        days = np.arange(self.start_date, self.end_date + datetime.timedelta(days=1), dtype='datetime64[D]')
+        self.day_index = days[np.is_busday(days, busdaycal=self.calendar)]
+        return self.day_index.tolist()
+    def fingerprint(self, *parts):
+        # Canonical hash of the calendar and the scheduling inputs, used as the cache key
+        return fingerprint('schedule', self.start_date, self.end_date, self.max_courses_per_day, self.holidays,
+                           self.weekmask, *parts)
+
+    def schedule_courses(self, course_colors, course_sessions, allowed_time_slots, engine='greedy', time_budget=10.0,
+                         seed=None, cache=None, stats=None):
+        # engine='greedy' is the randomized day-by-day pass (reproducible with seed); engine='cp' runs
+        # the constraint solver, which returns a complete schedule or raises UnsatisfiableScheduleError
+        # with the reason (TimeoutError if time_budget seconds are not enough).
+        # With a ScheduleCache, results of the solver and of seeded greedy runs are reused.
+        # With an instrumentation.Stats, phase timers and counters are collected
+        if engine not in ('greedy', 'cp'):
+            raise ValueError(f"Unknown scheduling engine '{engine}'. Choose 'greedy' or 'cp'.")
+        stats = NULL_STATS if stats is None else stats
+
+        with stats.run('scheduling'):
+            key = None
+            if cache is not None and (engine == 'cp' or seed is not None):
+                # Entries are (schedule, unplaced sessions)
+                key = self.fingerprint('schedule_and_unplaced', engine, seed, course_colors, course_sessions,
+                                       allowed_time_slots)
+                cached = cache.get(key)
+                if cached is not None:
+                    stats.count('cache_hits')
+                    schedule, unplaced = cached
+                    schedule = {date: list(day_schedule) for date, day_schedule in schedule.items()}
+                    self.unplaced = dict(unplaced)
+                    self._report_unplaced(course_sessions, stats)
+                    self._keep_schedule(schedule, course_colors, course_sessions, allowed_time_slots)
+                    return schedule
+                stats.count('cache_misses')
+
+            if engine == 'cp':
+                with stats.timer('solver'):
+                    schedule = solve_schedule(self.dates, course_colors, course_sessions, allowed_time_slots,
+                                              [morning_slots, afternoon_slots], time_slots, self.max_courses_per_day,
+                                              time_budget, stats)
+                for date in schedule:
+                    schedule[date].sort(key=lambda x: slot_rank[x[1]])
+                self.unplaced = {}  # The solver only returns complete schedules
+            else:
+                schedule = self._schedule_greedy(course_colors, course_sessions, allowed_time_slots, seed, stats)
+
+            if key is not None:
+                cache.put(key, ({date: list(day_schedule) for date, day_schedule in schedule.items()},
+                                dict(self.unplaced)))
+            self._keep_schedule(schedule, course_colors, course_sessions, allowed_time_slots)
+            return schedule
+
+    def _schedule_greedy(self, course_colors, course_sessions, allowed_time_slots, seed, stats):
+        rng = random.Random(seed)
         schedule = {date: [] for date in self.dates}
         course_occurrences = {course: 0 for course in course_colors.keys()}
 
         # Save the colors already programmed for each day
         colors_scheduled_per_day = {date: set() for date in self.dates}
 
+        # Counted locally and reported once, so instrumentation costs nothing inside the loop
+        placement_attempts = rejected_colors = rejected_slots = 0
+
         # Iterate through each date in the quarter
-        for date in self.dates:
-            morning = random.choice([True, False])
-            slots_today = list(morning_slots.keys()) if morning else list(afternoon_slots.keys())
-
-            courses_today = list(course_colors.keys())
-            random.shuffle(courses_today)
-
-            for course in courses_today:
-                if course_occurrences[course] < course_sessions[course]:
-                    course_color = course_colors[course]
-
-                    # Check if the color of the course is already scheduled for this day
-                    if course_color not in colors_scheduled_per_day[date]:
-                        for slot in allowed_time_slots[course]:
-                            if slot in slots_today:
-                                time_slot = time_slots[slot]
-                                schedule[date].append((course, time_slot))
-                                course_occurrences[course] += 1
-                                slots_today.remove(slot)
-
-                                # Add the course color to the colors programmed for this day.
-                                colors_scheduled_per_day[date].add(course_color)
-                                break
-
-                if len(schedule[date]) >= self.max_courses_per_day or not slots_today:
-                    break
+        with stats.timer('placement'):
+            for date in self.dates:
+                morning = rng.choice([True, False])
+                slots_today = list(morning_slots.keys()) if morning else list(afternoon_slots.keys())
 
-            schedule[date] = sorted(schedule[date], key=lambda x: datetime.datetime.strptime(x[1], '%I:%M %p'))
+                courses_today = list(course_colors.keys())
+                rng.shuffle(courses_today)
 
-        # Verify that all courses have been scheduled the correct number of times
-        for course, count in course_occurrences.items():
-            if count < course_sessions[course]:
-                print(f"Warning: {course} has only been scheduled {count} times, but needs {course_sessions[course]} sessions.")
+                for course in courses_today:
+                    if course_occurrences[course] < course_sessions[course]:
+                        course_color = course_colors[course]
+                        placement_attempts += 1
+
+                        # Check if the color of the course is already scheduled for this day
+                        if course_color not in colors_scheduled_per_day[date]:
+                            for slot in allowed_time_slots[course]:
+                                if slot in slots_today:
+                                    time_slot = time_slots[slot]
+                                    schedule[date].append((course, time_slot))
+                                    course_occurrences[course] += 1
+                                    slots_today.remove(slot)
+
+                                    # Add the course color to the colors programmed for this day.
+                                    colors_scheduled_per_day[date].add(course_color)
+                                    break
+                            else:
+                                rejected_slots += 1
+                        else:
+                            rejected_colors += 1
+
+                    if len(schedule[date]) >= self.max_courses_per_day or not slots_today:
+                        break
 
+                schedule[date].sort(key=lambda x: slot_rank[x[1]])
+
+        stats.count('days', len(self.dates))
+        stats.count('placement_attempts', placement_attempts)
+        stats.count('rejected_colors', rejected_colors)
+        stats.count('rejected_slots', rejected_slots)
+
+        # Repair pass over the dates the random day choices left with room
+        self.fill_in_gaps(schedule, course_occurrences, course_sessions, allowed_time_slots, course_colors, stats)
+
+        self._report_unplaced(course_sessions, stats)
         return schedule
 
-    def fill_in_gaps(self, schedule, course_occurrences, course_sessions, allowed_time_slots):
-    # Iterate over each course to ensure it meets the required session count
-        for course, sessions_needed in course_sessions.items():
-            while course_occurrences[course] < sessions_needed:
-                # Find dates where this course can be scheduled
-                for date in self.dates:
-                    if self.can_schedule_course_on_date(course, date, schedule, allowed_time_slots, course_occurrences):
-                        # Find the next available slot on this date
-                        for slot in allowed_time_slots[course]:
-                            time_slot = time_slots[slot]
-                            # Schedule the course in the available slot
-                            schedule[date].append((course, time_slot))
-                            course_occurrences[course] += 1
-                            break  # Break after scheduling to avoid double booking
-                    if course_occurrences[course] >= sessions_needed:
-                        break  # Break the outer loop if we've scheduled enough sessions
-
-                if course_occurrences[course] < sessions_needed:
-                    # If we've gone through all dates and still can't schedule, raise an error
-                    raise ValueError(f"Cannot schedule all sessions for {course}. Please check constraints.")
-
-        # Sort the schedule for each date by time slot
-        for date in schedule:
-            schedule[date].sort(key=lambda x: time_slots.index(x[1]))
+    def _report_unplaced(self, course_sessions, stats):
+        # Verify that all courses have been scheduled the correct number of times
+        for course, missing in self.unplaced.items():
+            logger.warning("%s has only been scheduled %d times, but needs %d sessions.",
+                           course, course_sessions[course] - missing, course_sessions[course])
+        stats.count('unplaced_sessions', sum(self.unplaced.values()))
+
+    def best_of(self, course_colors, course_sessions, allowed_time_slots, n_trials=32, workers=None, seed=0):
+        # Run n_trials greedy attempts with seeds seed, seed + 1, ... over a process pool and return
+        # the best ScheduleTrial. The first complete schedule by seed wins, so the result is the same
+        # for any number of workers: once a trial is complete and every lower seed has finished,
+        # the trials with higher seeds are cancelled
+        if n_trials < 1:
+            raise ValueError("best_of needs at least one trial.")
+        seeds = range(seed, seed + n_trials)
+        allowed_time_slots = {course: set(slots) for course, slots in allowed_time_slots.items()}  # Picklable
+        schedule_args = (self.start_date, self.end_date, self.max_courses_per_day, self.holidays, self.weekmask)
+        trials = {}  # Seed -> finished ScheduleTrial
+
+        def first_complete():
+            # Lowest complete seed once all lower seeds have finished, else None
+            for trial_seed in seeds:
+                if trial_seed not in trials:
+                    return None
+                if trials[trial_seed].score[0] == 0:
+                    return trials[trial_seed]
+            return None
+
+        if workers == 1:
+            for trial_seed in seeds:
+                trials[trial_seed] = _run_trial(schedule_args, trial_seed, course_colors, course_sessions,
+                                                allowed_time_slots)
+                if trials[trial_seed].score[0] == 0:
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = {
+                    executor.submit(_run_trial, schedule_args, trial_seed, course_colors, course_sessions,
+                                    allowed_time_slots): trial_seed
+                    for trial_seed in seeds
+                }
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        trials[pending.pop(future)] = future.result()
+                    complete = first_complete()
+                    if complete is not None:
+                        # Only higher seeds are left: drop the trials that haven't started
+                        for future in pending:
+                            future.cancel()
+                        break
+
+        best = first_complete() or min(trials.values(), key=lambda trial: (trial.score, trial.seed))
+        counts = collections.Counter(course for day_schedule in best.schedule.values() for course, _ in day_schedule)
+        self.unplaced = {course: sessions - counts[course] for course, sessions in course_sessions.items()
+                         if counts[course] < sessions}
+        self._keep_schedule(best.schedule, course_colors, course_sessions, allowed_time_slots)
+        return best
+
+    # ---------------------------- GAP FILLING ----------------------------
+    def fill_in_gaps(self, schedule, course_occurrences, course_sessions, allowed_time_slots, course_colors=None,
+                     stats=None):
+        # Repair pass for under-scheduled courses: one sweep over the dates, placing the courses that
+        # are most behind first. Every (date, slot) check is O(1) through a _ScheduleIndex. Sessions
+        # that still can't be placed are left in self.unplaced ({course: missing sessions}).
+        # course_colors defaults to the coloring of the last schedule_courses call
+        stats = NULL_STATS if stats is None else stats
+        if course_colors is None:
+            course_colors = getattr(self, 'course_colors', None)
+            if course_colors is None:
+                raise ValueError("fill_in_gaps needs course_colors when no schedule has been built yet.")
+        allowed_masks = {course: _slot_mask(slots) for course, slots in allowed_time_slots.items()}
+
+        with stats.timer('gap_filling'):
+            index = _ScheduleIndex(schedule, course_colors, self.max_courses_per_day)
+            deficits = {course: course_sessions[course] - course_occurrences[course] for course in course_occurrences
+                        if course_occurrences[course] < course_sessions[course]}
+            placed = rejected = 0
+
+            for date in self.dates:
+                if not deficits:
+                    break
+                for course in sorted(deficits, key=deficits.get, reverse=True):
+                    if index.is_full(date):
+                        break
+                    slot = index.free_slot(course, date, allowed_masks[course])
+                    if slot is None:
+                        rejected += 1
+                        continue
+                    schedule[date].append((course, time_slots[slot]))
+                    index.add(date, course, slot)
+                    course_occurrences[course] += 1
+                    placed += 1
+                    deficits[course] -= 1
+                    if not deficits[course]:
+                        del deficits[course]
+
+            # Sort the schedule for each date by time slot
+            for date in schedule:
+                schedule[date].sort(key=lambda x: slot_rank[x[1]])
 
+        stats.count('gap_placements', placed)
+        stats.count('gap_rejected_slots', rejected)
+        self.unplaced = deficits
         return schedule
 
-def can_schedule_course_on_date(self, course, date, schedule, allowed_time_slots, course_occurrences):
-    # Check if the course has already been scheduled the maximum number of times
-    if course_occurrences[course] >= course_sessions[course]:
-        return False
+    # ---------------------------- INCREMENTAL UPDATES ----------------------------
+    # The last schedule produced is kept so that mid-term changes only touch the affected dates.
+    # Every update returns the diff against the published schedule as
+    # {'removed': [(date, course, time_slot)], 'added': [(date, course, time_slot)], 'unplaced': [course]}
+
+    def _keep_schedule(self, schedule, course_colors, course_sessions, allowed_time_slots):
+        self.schedule = schedule
+        self.course_colors = dict(course_colors)
+        self.course_sessions = dict(course_sessions)
+        self.allowed_time_slots = allowed_time_slots
+        self._index = _ScheduleIndex(schedule, self.course_colors, self.max_courses_per_day)
+
+    def _place_session(self, course, diff):
+        # Place one more session of the course on the feasible date farthest from its other sessions
+        taken = sorted(self.date_positions[date] for date in self._index.course_dates[course])
+        allowed_mask = _slot_mask(self.allowed_time_slots[course])
+        best = None
+        for date in self.dates:
+            slot = self._index.free_slot(course, date, allowed_mask)
+            if slot is None:
+                continue
+            position = self.date_positions[date]
+            i = bisect.bisect_left(taken, position)
+            distance = min([abs(position - taken[j]) for j in (i - 1, i) if 0 <= j < len(taken)], default=len(self.dates))
+            if best is None or distance > best[0]:
+                best = (distance, date, slot)
+
+        if best is None:
+            diff['unplaced'].append(course)
+            return
+        _, date, slot = best
+        self.schedule[date].append((course, time_slots[slot]))
+        self.schedule[date].sort(key=lambda x: slot_rank[x[1]])
+        self._index.add(date, course, slot)
+        diff['added'].append((date, course, time_slots[slot]))
+
+    def _remove_session(self, date, course, time_slot, diff):
+        self.schedule[date].remove((course, time_slot))
+        self._index.remove(date, course, slot_labels[time_slot])
+        diff['removed'].append((date, course, time_slot))
+
+    def remove_date(self, date):
+        # Take a date out of the calendar (a new holiday or strike day) and move its sessions
+        diff = {'removed': [], 'added': [], 'unplaced': []}
+        if date not in self.date_positions:
+            return diff
+
+        displaced = list(self.schedule[date])
+        for course, time_slot in displaced:
+            self._remove_session(date, course, time_slot, diff)
+
+        self.holidays = sorted(set(self.holidays) | {date})
+        self.dates.remove(date)
+        self.day_index = self.day_index[self.day_index != np.datetime64(date)]
+        self.date_positions = {date: i for i, date in enumerate(self.dates)}
+        del self.schedule[date]
+        self._index.drop_date(date)
+
+        for course, _ in displaced:
+            self._place_session(course, diff)
+        return diff
+
+    def update_sessions(self, course, sessions):
+        # Change the number of sessions of a course: extra sessions are placed where they fit best,
+        # and when there are fewer the last ones of the trimester are dropped
+        diff = {'removed': [], 'added': [], 'unplaced': []}
+        placed = sorted(self._index.course_dates[course])
+        self.course_sessions[course] = sessions
+
+        for date in placed[sessions:][::-1]:
+            time_slot = next(time_slot for scheduled, time_slot in self.schedule[date] if scheduled == course)
+            self._remove_session(date, course, time_slot, diff)
+        for _ in range(sessions - len(placed)):
+            self._place_session(course, diff)
+        return diff
+
+    def update_colors(self, color_changes):
+        # Apply recolorings ({course: (old color, new color)}, as returned by
+        # CourseGraph.add_conflict_incremental): only sessions that now share a date with a course
+        # of the same color are moved
+        diff = {'removed': [], 'added': [], 'unplaced': []}
+        for course, (_, color) in color_changes.items():
+            self._index.recolor(course, color)
+            self.course_sessions.setdefault(course, 0)
+
+        moved = []
+        for course in color_changes:
+            for date in sorted(self._index.course_dates[course]):
+                if self._index.colors[date][self.course_colors[course]] > 1:
+                    time_slot = next(time_slot for scheduled, time_slot in self.schedule[date] if scheduled == course)
+                    self._remove_session(date, course, time_slot, diff)
+                    moved.append(course)
+        for course in moved:
+            self._place_session(course, diff)
+        return diff
+
+
+def _slot_mask(slots):
+    # Bitmap with one bit per slot id
+    mask = 0
+    for slot in slots:
+        mask |= 1 << slot
+    return mask
+
+
+morning_mask = _slot_mask(morning_slots)
+afternoon_mask = _slot_mask(afternoon_slots)
+
+
+class _ScheduleIndex:
+    # Occupancy of a schedule for O(1) placement checks: a bitmap of the used slots and a count of
+    # the colors on each date, plus the set of dates holding each course
+    def __init__(self, schedule, course_colors, max_courses_per_day):
+        self.course_colors = course_colors
+        self.max_courses_per_day = max_courses_per_day
+        self.used_slots = dict.fromkeys(schedule, 0)
+        self.colors = {date: collections.Counter() for date in schedule}
+        self.course_dates = collections.defaultdict(set)
+        for date, day_schedule in schedule.items():
+            for course, time_slot in day_schedule:
+                self.add(date, course, slot_labels[time_slot])
+
+    def add(self, date, course, slot):
+        self.used_slots[date] |= 1 << slot
+        self.colors[date][self.course_colors[course]] += 1
+        self.course_dates[course].add(date)
+
+    def remove(self, date, course, slot):
+        self.used_slots[date] &= ~(1 << slot)
+        self.colors[date][self.course_colors[course]] -= 1
+        self.course_dates[course].discard(date)
 
-    # Check if the course is allowed to be scheduled on this date based on time slot restrictions
-    day_slots = morning_slots if date.hour < 12 else afternoon_slots
-    if not set(allowed_time_slots[course]).intersection(day_slots.keys()):
-        return False
+    def drop_date(self, date):
+        del self.used_slots[date]
+        del self.colors[date]
 
-    # Check if adding this course would exceed the maximum courses per day
-    if len(schedule[date]) >= self.max_courses_per_day:
-        return False
+    def recolor(self, course, color):
+        for date in self.course_dates[course]:
+            self.colors[date][self.course_colors[course]] -= 1
+            self.colors[date][color] += 1
+        self.course_colors[course] = color
 
-    # Check if the course is already scheduled on this date
-    if any(course == scheduled_course for scheduled_course, _ in schedule[date]):
-        return False
+    def is_full(self, date):
+        return bin(self.used_slots[date]).count('1') >= self.max_courses_per_day
 
-    return True
+    def free_slot(self, course, date, allowed_mask):
+        # Earliest slot where the course can go on this date, or None: the date must have room,
+        # must not already hold the course or its color, and must stay in one part of the day
+        used = self.used_slots[date]
+        if self.is_full(date) or date in self.course_dates[course] or self.colors[date][self.course_colors[course]]:
+            return None
 
-    
\ No newline at end of file
+        if used & morning_mask:
+            free = morning_mask & ~used & allowed_mask
+        elif used & afternoon_mask:
+            free = afternoon_mask & ~used & allowed_mask
+        else:
+            free = allowed_mask
+        for slot in slot_order:
+            if free >> slot & 1:
+                return slot
+        return None